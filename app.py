@@ -1,12 +1,21 @@
-streamlit run import pandas as pd
+import numpy as np
+import pandas as pd
 import streamlit as st
-from datetime import datetime
 import plotly.express as px
+import plotly.graph_objects as go
+
+from sales_data import DATA_FILE, fast_isin, filter_options, get_con, load_sales
+from viz import lttb_downsample, table_preview
+
+# 折れ線グラフに渡す最大点数（超えたら LTTB で間引く）
+MAX_CHART_POINTS = 2000
+# 明細テーブルに表示する最大行数
+MAX_ROWS = 5000
 
 # ─────────────────────────────
 # データ読み込み
 # ─────────────────────────────
-df = pd.read_csv("data/sample_sales.csv", parse_dates=["date"])
+df = load_sales(DATA_FILE)
 
 # ─────────────────────────────
 # UI ― フィルター類
@@ -24,46 +33,97 @@ date_range = st.slider(
     format="YYYY-MM-DD",
 )
 
+options = filter_options(DATA_FILE)
 cats = st.multiselect(
     "カテゴリを選択（複数可）",
-    options=df["category"].unique().tolist(),
-    default=df["category"].unique().tolist(),
+    options=options["category"],
+    default=options["category"],
 )
 regions = st.multiselect(
     "地域を選択（複数可）",
-    options=df["region"].unique().tolist(),
-    default=df["region"].unique().tolist(),
+    options=options["region"],
+    default=options["region"],
 )
 channels = st.multiselect(
     "チャネルを選択（複数可）",
-    options=df["sales_channel"].unique().tolist(),
-    default=df["sales_channel"].unique().tolist(),
+    options=options["sales_channel"],
+    default=options["sales_channel"],
 )
 
 # ─────────────────────────────
 # フィルタリング
 # ─────────────────────────────
-start_dt = pd.to_datetime(date_range[0])
-end_dt   = pd.to_datetime(date_range[1])
-
-df_filt = df[
-    (df["date"].between(start_dt, end_dt))
-    & (df["category"].isin(cats))
-    & (df["region"].isin(regions))
-    & (df["sales_channel"].isin(channels))
-]
+# スライダーの datetime をそのまま使い、比較用に datetime64 へ一度だけ変換
+start_dt, end_dt = date_range
+start_np = np.datetime64(start_dt, "ns")
+end_np   = np.datetime64(end_dt, "ns")
+
+# df は日付順なので、期間は二分探索でスライス
+date_vals = df["date"].to_numpy()
+lo = date_vals.searchsorted(start_np, side="left")
+hi = date_vals.searchsorted(end_np, side="right")
+df_range = df.iloc[lo:hi]
+
+# カテゴリ列は整数コード同士で比較（文字列比較を避ける）
+mask = np.ones(len(df_range), dtype=bool)
+for col, selected in (("category", cats), ("region", regions), ("sales_channel", channels)):
+    np.logical_and(mask, fast_isin(df_range[col], selected), out=mask)
+
+df_filt = df_range[mask]
+
+# 集計は DuckDB で実行（フィルタと集計を 1 スキャンで）
+# 同じフィルタ条件の再実行はキャッシュから返す
+@st.cache_data(max_entries=32, show_spinner=False)
+def aggregate_sales(start_dt, end_dt, cats, regions, channels):
+    # KPI と 3 つの内訳を GROUPING SETS でまとめて 1 クエリに
+    return get_con(DATA_FILE).cursor().execute(
+        """
+        SELECT
+            CASE
+                WHEN GROUPING(date) = 0 THEN 'date'
+                WHEN GROUPING(category) = 0 THEN 'category'
+                WHEN GROUPING(region) = 0 THEN 'region'
+                ELSE 'total'
+            END AS grouping_key,
+            date, category, region,
+            CAST(COALESCE(SUM(revenue), 0) AS BIGINT) AS revenue,
+            CAST(COALESCE(SUM(units), 0) AS BIGINT) AS units,
+            AVG(unit_price) AS unit_price
+        FROM sales
+        WHERE date BETWEEN ? AND ?
+          AND category IN ? AND region IN ? AND sales_channel IN ?
+        GROUP BY GROUPING SETS ((date), (category), (region), ())
+        """,
+        [start_dt, end_dt, list(cats), list(regions), list(channels)],
+    ).df()
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def kpi_strings(*filters):
+    # KPI の整形結果もフィルタ条件ごとにキャッシュ
+    agg = aggregate_sales(*filters)
+    totals = agg[agg["grouping_key"] == "total"].iloc[0]
+    total_revenue  = int(totals["revenue"])
+    total_units    = int(totals["units"])
+    avg_unit_price = int(totals["unit_price"]) if not pd.isna(totals["unit_price"]) else 0
+    return f"{total_revenue:,.0f}", f"{total_units:,}", f"{avg_unit_price:,.0f}"
+
+
+filters = (
+    start_dt, end_dt, tuple(sorted(cats)), tuple(sorted(regions)), tuple(sorted(channels))
+)
+agg = aggregate_sales(*filters)
+grouping_key = agg["grouping_key"]
 
 # ─────────────────────────────
 # KPI
 # ─────────────────────────────
-total_revenue  = int(df_filt["revenue"].sum())
-total_units    = int(df_filt["units"].sum())
-avg_unit_price = int(df_filt["unit_price"].mean()) if not df_filt.empty else 0
+revenue_str, units_str, price_str = kpi_strings(*filters)
 
 col1, col2, col3 = st.columns(3)
-col1.metric("売上合計 (円)", f"{total_revenue:,.0f}")
-col2.metric("販売数量 (個)", f"{total_units:,}")
-col3.metric("平均単価 (円)", f"{avg_unit_price:,.0f}")
+col1.metric("売上合計 (円)", revenue_str)
+col2.metric("販売数量 (個)", units_str)
+col3.metric("平均単価 (円)", price_str)
 
 st.divider()
 
@@ -72,23 +132,37 @@ st.divider()
 # ─────────────────────────────
 
 # 1) 日別売上推移
-revenue_daily = (
-    df_filt.groupby("date", as_index=False)["revenue"].sum().sort_values("date")
+revenue_daily = agg.loc[grouping_key == "date", ["date", "revenue"]].sort_values("date")
+if len(revenue_daily) > MAX_CHART_POINTS:
+    revenue_daily = revenue_daily.iloc[
+        lttb_downsample(
+            revenue_daily["date"].to_numpy().astype("int64"),
+            revenue_daily["revenue"].to_numpy(),
+            MAX_CHART_POINTS,
+        )
+    ]
+# WebGL (Scattergl) で描画し、点数が増えても DOM を膨らませない
+fig_daily = go.Figure(
+    go.Scattergl(
+        x=revenue_daily["date"],
+        y=revenue_daily["revenue"],
+        mode="lines+markers",
+        name="売上 (円)",
+    )
 )
-fig_daily = px.line(
-    revenue_daily,
-    x="date",
-    y="revenue",
-    markers=True,
-    labels={"date": "日付", "revenue": "売上 (円)"},
+fig_daily.update_layout(
+    height=350,
+    hovermode="x unified",
     title="🗓️ 日別売上推移",
+    xaxis_title="日付",
+    yaxis_title="売上 (円)",
+    uirevision="daily",
 )
-fig_daily.update_layout(height=350, hovermode="x unified")
 st.plotly_chart(fig_daily, use_container_width=True)
 
 # 2) カテゴリ別売上
 revenue_by_cat = (
-    df_filt.groupby("category", as_index=False)["revenue"].sum().sort_values("revenue")
+    agg.loc[grouping_key == "category", ["category", "revenue"]].sort_values("revenue")
 )
 fig_cat = px.bar(
     revenue_by_cat,
@@ -98,12 +172,12 @@ fig_cat = px.bar(
     labels={"category": "カテゴリ", "revenue": "売上 (円)"},
     title="🏷️ カテゴリ別売上",
 )
-fig_cat.update_layout(height=350)
+fig_cat.update_layout(height=350, uirevision="category")
 st.plotly_chart(fig_cat, use_container_width=True)
 
 # 3) 地域別売上
 revenue_by_region = (
-    df_filt.groupby("region", as_index=False)["revenue"].sum().sort_values("revenue")
+    agg.loc[grouping_key == "region", ["region", "revenue"]].sort_values("revenue")
 )
 fig_region = px.bar(
     revenue_by_region,
@@ -113,7 +187,7 @@ fig_region = px.bar(
     labels={"region": "地域", "revenue": "売上 (円)"},
     title="🌎 地域別売上",
 )
-fig_region.update_layout(height=350)
+fig_region.update_layout(height=350, uirevision="region")
 st.plotly_chart(fig_region, use_container_width=True)
 
 st.divider()
@@ -122,4 +196,7 @@ st.divider()
 # 明細テーブル
 # ─────────────────────────────
 with st.expander("📄 フィルタ後データを表示"):
-    st.dataframe(df_filt.reset_index(drop=True), use_container_width=True)
+    preview, truncated = table_preview(df_filt, MAX_ROWS)
+    st.dataframe(preview, use_container_width=True, hide_index=True)
+    if truncated:
+        st.caption(f"先頭 {MAX_ROWS:,} 行を表示しています（全 {len(df_filt):,} 行）")
@@ -1,16 +1,18 @@
 import streamlit as st
 import pandas as pd
 import duckdb
+import asyncio
 import logging
 import os
-from datetime import datetime
+from collections import deque
 from typing import Optional
-from io import StringIO
+from io import BytesIO
 
 # Import our custom modules
 import llm_adapter
 import sql_guard
 import viz
+from sales_data import get_con, load_sales
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,6 +21,7 @@ logger = logging.getLogger(__name__)
 # Constants
 DATA_FILE = "data/sample_sales.csv"
 MAX_ROWS = 5000
+MAX_MESSAGES = 40  # Chat history kept per session (user + assistant messages)
 
 # Page configuration
 st.set_page_config(
@@ -29,46 +32,38 @@ st.set_page_config(
 
 # Initialize session state
 if 'messages' not in st.session_state:
-    st.session_state.messages = []
-if 'con' not in st.session_state:
-    st.session_state.con = None
-if 'data_loaded' not in st.session_state:
-    st.session_state.data_loaded = False
-if 'schema_info' not in st.session_state:
-    st.session_state.schema_info = ""
+    st.session_state.messages = deque(maxlen=MAX_MESSAGES)
 
 
-def load_data() -> tuple[pd.DataFrame, str]:
-    """Load CSV data and return DataFrame and schema info"""
+@st.cache_data(show_spinner=False)
+def get_schema_info() -> str:
+    """Generate schema information for the LLM (computed once per process)"""
+    df = load_sales(DATA_FILE)
+    
+    schema_lines = ["CREATE TABLE sales ("]
+    for col, dtype in df.dtypes.items():
+        if dtype == 'datetime64[ns]':
+            sql_type = 'TIMESTAMP'
+        elif dtype in ['int64', 'int32']:
+            sql_type = 'INTEGER'
+        elif dtype in ['float64', 'float32']:
+            sql_type = 'DOUBLE'
+        else:
+            sql_type = 'TEXT'
+        schema_lines.append(f"  {col} {sql_type},")
+    
+    schema_lines[-1] = schema_lines[-1].rstrip(',')  # Remove last comma
+    schema_lines.append(");")
+    schema_lines.append("-- Helper table: sales_with_month has all columns plus 'month' (first day of month).")
+    
+    logger.info(f"Data loaded successfully: {len(df)} rows, {len(df.columns)} columns")
+    return '\n'.join(schema_lines)
+
+
+def load_data() -> tuple[Optional[pd.DataFrame], str]:
+    """Load cached sales data and schema info, reporting errors in the UI"""
     try:
-        # Load CSV data
-        df = pd.read_csv(DATA_FILE)
-        
-        # Convert date column
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        
-        # Generate schema information for LLM
-        schema_lines = ["CREATE TABLE sales ("]
-        for col, dtype in df.dtypes.items():
-            if dtype == 'datetime64[ns]':
-                sql_type = 'TIMESTAMP'
-            elif dtype in ['int64', 'int32']:
-                sql_type = 'INTEGER'
-            elif dtype in ['float64', 'float32']:
-                sql_type = 'DOUBLE'
-            else:
-                sql_type = 'TEXT'
-            schema_lines.append(f"  {col} {sql_type},")
-        
-        schema_lines[-1] = schema_lines[-1].rstrip(',')  # Remove last comma
-        schema_lines.append(");")
-        schema_lines.append("-- Helper view: sales_with_month has all columns plus 'month' (first day of month).")
-        
-        schema_info = '\n'.join(schema_lines)
-        
-        logger.info(f"Data loaded successfully: {len(df)} rows, {len(df.columns)} columns")
-        return df, schema_info
-        
+        return load_sales(DATA_FILE), get_schema_info()
     except FileNotFoundError:
         st.error(f"データファイルが見つかりません: {DATA_FILE}")
         return None, ""
@@ -78,32 +73,6 @@ def load_data() -> tuple[pd.DataFrame, str]:
         return None, ""
 
 
-def setup_database(df: pd.DataFrame) -> duckdb.DuckDBPyConnection:
-    """Setup DuckDB connection and create tables/views"""
-    try:
-        # Create DuckDB connection
-        con = duckdb.connect(':memory:')
-        
-        # Register DataFrame as table
-        con.register('sales', df)
-        
-        # Create helper view with month column
-        con.execute("""
-            CREATE VIEW sales_with_month AS
-            SELECT *, 
-                   date_trunc('month', CAST(date AS TIMESTAMP)) as month
-            FROM sales
-        """)
-        
-        logger.info("Database setup completed successfully")
-        return con
-        
-    except Exception as e:
-        st.error(f"データベース設定エラー: {str(e)}")
-        logger.error(f"Database setup error: {e}")
-        return None
-
-
 def display_sidebar_summary(df: pd.DataFrame):
     """Display data summary and sample questions in sidebar"""
     with st.sidebar:
@@ -115,7 +84,7 @@ def display_sidebar_summary(df: pd.DataFrame):
         
         # Categories
         if 'category' in df.columns:
-            categories = df['category'].unique()
+            categories = df['category'].cat.categories
             with st.expander("カテゴリ一覧"):
                 for cat in categories[:10]:  # Show first 10
                     st.write(f"• {cat}")
@@ -124,21 +93,21 @@ def display_sidebar_summary(df: pd.DataFrame):
         
         # Regions
         if 'region' in df.columns:
-            regions = df['region'].unique()
+            regions = df['region'].cat.categories
             with st.expander("地域一覧"):
                 for region in regions:
                     st.write(f"• {region}")
         
         # Sales channels
         if 'sales_channel' in df.columns:
-            channels = df['sales_channel'].unique()
+            channels = df['sales_channel'].cat.categories
             with st.expander("販売チャネル"):
                 for channel in channels:
                     st.write(f"• {channel}")
         
         # Customer segments
         if 'customer_segment' in df.columns:
-            segments = df['customer_segment'].unique()
+            segments = df['customer_segment'].cat.categories
             with st.expander("顧客セグメント"):
                 for segment in segments:
                     st.write(f"• {segment}")
@@ -164,6 +133,39 @@ def display_sidebar_summary(df: pd.DataFrame):
                 st.rerun()  # Force refresh to show the result
 
 
+def to_feather_bytes(df: pd.DataFrame) -> bytes:
+    """Serialize a result DataFrame to Feather (Arrow IPC) bytes"""
+    buf = BytesIO()
+    df.reset_index(drop=True).to_feather(buf)
+    return buf.getvalue()
+
+
+def summarize_or_none(sql: str, data_preview: str) -> Optional[str]:
+    """Summarize results with the LLM, returning None if it fails"""
+    try:
+        return llm_adapter.summarize(sql, data_preview)
+    except Exception as e:
+        logger.warning(f"Summary generation failed: {e}")
+        return None
+
+
+async def fetch_rest_and_summarize(
+    con: duckdb.DuckDBPyConnection, sql: str, first_chunk: pd.DataFrame
+) -> tuple[pd.DataFrame, Optional[str]]:
+    """Fetch the remaining result chunks and summarize the preview concurrently"""
+    def fetch_rest() -> pd.DataFrame:
+        chunks = [first_chunk]
+        while not (chunk := con.fetch_df_chunk()).empty:
+            chunks.append(chunk)
+        return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else first_chunk
+    
+    data_preview = first_chunk.head(3).to_csv(index=False, sep='\t')
+    return await asyncio.gather(
+        asyncio.to_thread(fetch_rest),
+        asyncio.to_thread(summarize_or_none, sql, data_preview),
+    )
+
+
 def process_and_store_question(question: str):
     """Process a question and store the complete response in session state"""
     # Add user message to chat history
@@ -177,7 +179,7 @@ def process_and_store_question(question: str):
         # Step 1: Generate SQL
         sql = None
         try:
-            raw_sql = llm_adapter.generate_sql(question, st.session_state.schema_info)
+            raw_sql = llm_adapter.generate_sql(question, get_schema_info())
             logger.info(f"Generated raw SQL: {raw_sql}")
             sql = sql_guard.sanitize_sql(raw_sql)
             logger.info(f"Sanitized SQL: {sql}")
@@ -186,23 +188,26 @@ def process_and_store_question(question: str):
             sql = sql_guard.get_fallback_query(question)
             logger.info(f"Fallback SQL: {sql}")
         
-        # Step 2: Execute SQL and get results
-        result_df = None
+        # Step 2: Execute SQL and fetch the first chunk of results
         try:
-            result_df = st.session_state.con.execute(sql).df()
-            logger.info(f"SQL execution result: {len(result_df)} rows")
+            con = get_con(DATA_FILE).cursor()
+            con.execute(sql)
+            first_chunk = con.fetch_df_chunk()
             
-            if result_df.empty:
+            if first_chunk.empty:
                 logger.warning("Query result is empty")
                 st.session_state.messages.append({"role": "assistant", "content": "クエリの結果が空でした。"})
                 return
-            else:
-                logger.info(f"Result data: {result_df.to_dict()}")
                 
         except Exception as e:
             logger.error(f"SQL execution error: {e}")
             st.session_state.messages.append({"role": "assistant", "content": f"SQL実行エラー: {str(e)}"})
             return
+        
+        # Step 3: Summarize the preview while the remaining rows are fetched
+        result_df, summary = asyncio.run(fetch_rest_and_summarize(con, sql, first_chunk))
+        logger.info(f"SQL execution result: {len(result_df)} rows")
+        logger.info(f"Result data (head): {result_df.head().to_dict()}")
             
         # Add comprehensive assistant response to history with embedded data
         response_parts = [
@@ -211,12 +216,8 @@ def process_and_store_question(question: str):
         ]
         
         # Add summary if available  
-        try:
-            data_preview = result_df.head(3).to_string()
-            summary = llm_adapter.summarize(sql, data_preview)
+        if summary:
             response_parts.append(f"**分析結果:** {summary}")
-        except:
-            pass
             
         response_content = "\n\n".join(response_parts)
         
@@ -225,7 +226,7 @@ def process_and_store_question(question: str):
             "role": "assistant", 
             "content": response_content, 
             "has_data": True,
-            "result_df": result_df.to_dict(),  # Store as dict to avoid pickle issues
+            "result_feather": to_feather_bytes(result_df),  # Arrow IPC keeps dtypes
             "sql": sql
         }
         st.session_state.messages.append(message_data)
@@ -248,31 +249,12 @@ def main():
     サイドバーのサンプル質問をクリックするか、下の入力欄に質問を入力してください。
     """)
     
-    # Initialize data if not already loaded
-    if not st.session_state.data_loaded:
-        with st.spinner("データを読み込み中..."):
-            df, schema_info = load_data()
-            
-            if df is not None:
-                con = setup_database(df)
-                if con is not None:
-                    st.session_state.con = con
-                    st.session_state.schema_info = schema_info
-                    st.session_state.data_loaded = True
-                    
-                    # Display sidebar summary
-                    display_sidebar_summary(df)
-                    
-                    st.success("✅ データの読み込みが完了しました！")
-                else:
-                    st.stop()
-            else:
-                st.stop()
-    else:
-        # Data already loaded, just display sidebar
-        df, _ = load_data()  # Reload for sidebar display
-        if df is not None:
-            display_sidebar_summary(df)
+    # Load data (cached across reruns and sessions)
+    with st.spinner("データを読み込み中..."):
+        df, _ = load_data()
+    if df is None:
+        st.stop()
+    display_sidebar_summary(df)
     
     # Check for LLM configuration
     if not os.getenv('OPENAI_API_KEY') and not os.getenv('ANTHROPIC_API_KEY'):
@@ -295,15 +277,17 @@ def main():
             # If this is an assistant message with data, show table and graph
             if (message["role"] == "assistant" and message.get("has_data", False)):
                 try:
-                    # Reconstruct DataFrame from stored dict
-                    result_df = pd.DataFrame.from_dict(message["result_df"])
+                    # Reconstruct DataFrame from stored Feather bytes
+                    result_df = pd.read_feather(BytesIO(message["result_feather"]))
                     
                     # Display data table
-                    st.dataframe(result_df, use_container_width=True)
+                    preview, truncated = viz.table_preview(result_df, MAX_ROWS)
+                    st.dataframe(preview, use_container_width=True)
+                    if truncated:
+                        st.caption(f"先頭 {MAX_ROWS:,} 行を表示しています（全 {len(result_df):,} 行）")
                     
                     # Display visualization
                     try:
-                        import viz
                         viz.auto_visualize(result_df)
                     except Exception as e:
                         st.warning(f"グラフの表示に失敗しました: {e}")
@@ -4,7 +4,6 @@ Debug version of the chatbot app to identify display issues
 """
 
 import streamlit as st
-import pandas as pd
 import duckdb
 import logging
 import os
@@ -13,7 +12,7 @@ from typing import Optional
 
 # Import our custom modules
 import llm_adapter
-import sql_guard
+import nlp_cache
 import viz
 
 # Configure logging
@@ -37,54 +36,45 @@ os.environ.pop('ANTHROPIC_API_KEY', None)
 # Initialize session state
 if 'messages' not in st.session_state:
     st.session_state.messages = []
-if 'con' not in st.session_state:
-    st.session_state.con = None
-if 'data_loaded' not in st.session_state:
-    st.session_state.data_loaded = False
 
-@st.cache_data
-def load_and_setup_data():
-    """Load data and return necessary objects"""
-    # Load CSV data
-    df = pd.read_csv('data/sample_sales.csv')
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    
-    # Setup DuckDB
+@st.cache_resource
+def get_con():
+    """Create the DuckDB connection shared by all sessions"""
+    # CSV is parsed by DuckDB's reader, no pandas round-trip
     con = duckdb.connect(':memory:')
-    con.register('sales', df)
     con.execute("""
-        CREATE VIEW sales_with_month AS
+        CREATE TABLE sales AS
+        SELECT * REPLACE (CAST(date AS TIMESTAMP) AS date)
+        FROM read_csv_auto('data/sample_sales.csv', header=True, sample_size=-1)
+    """)
+    con.execute("""
+        CREATE TABLE sales_with_month AS
         SELECT *, date_trunc('month', CAST(date AS TIMESTAMP)) as month
         FROM sales
     """)
-    
-    # Generate schema
-    schema_lines = ["CREATE TABLE sales ("]
-    for col, dtype in df.dtypes.items():
-        if dtype == 'datetime64[ns]':
-            sql_type = 'TIMESTAMP'
-        elif dtype in ['int64', 'int32']:
-            sql_type = 'INTEGER'
-        elif dtype in ['float64', 'float32']:
-            sql_type = 'DOUBLE'
-        else:
-            sql_type = 'TEXT'
-        schema_lines.append(f"  {col} {sql_type},")
-    
-    schema_lines[-1] = schema_lines[-1].rstrip(',')
-    schema_lines.append(");")
-    schema_info = '\n'.join(schema_lines)
-    
-    return df, con, schema_info
+    return con
 
-# Load data
-if not st.session_state.data_loaded:
-    with st.spinner("データ読み込み中..."):
-        df, con, schema_info = load_and_setup_data()
-        st.session_state.con = con
-        st.session_state.schema_info = schema_info
-        st.session_state.data_loaded = True
-        st.success(f"✅ データ読み込み完了: {len(df)}行")
+@st.cache_data
+def get_schema():
+    """Generate schema text for the LLM"""
+    # DuckDB already knows the column types; use them as-is
+    rows = get_con().execute("DESCRIBE sales").fetchall()
+    return "CREATE TABLE sales (\n" + ",\n".join(f"  {name} {ctype}" for name, ctype, *_ in rows) + "\n);"
+
+@st.cache_data
+def region_counts():
+    """Row count per region for the debug panel"""
+    return get_con().execute("SELECT region, COUNT(*) as count FROM sales GROUP BY region ORDER BY region").to_arrow_table()
+
+# MockLLMAdapter is stateless, so one instance serves every click
+mock_adapter = llm_adapter.MockLLMAdapter()
+
+# Load data (cached; each rerun queries through its own cursor)
+with st.spinner("データ読み込み中..."):
+    con = get_con().cursor()
+    schema_info = get_schema()
+row_count = con.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+st.success(f"✅ データ読み込み完了: {row_count}行")
 
 # Debug info
 with st.expander("🔧 デバッグ情報"):
@@ -93,10 +83,7 @@ with st.expander("🔧 デバッグ情報"):
     st.write(f"- ANTHROPIC_API_KEY: {'設定済み' if os.getenv('ANTHROPIC_API_KEY') else '未設定'}")
     
     st.write("**データ情報:**")
-    if st.session_state.data_loaded:
-        test_query = "SELECT region, COUNT(*) as count FROM sales GROUP BY region ORDER BY region"
-        result = st.session_state.con.execute(test_query).df()
-        st.dataframe(result)
+    st.dataframe(region_counts())
 
 # Test buttons
 st.subheader("🧪 テストボタン")
@@ -112,25 +99,25 @@ with col1:
         # Step 1: SQL生成
         st.write("**Step 1: SQL生成**")
         try:
-            raw_sql = llm_adapter.generate_sql(question, st.session_state.schema_info)
+            raw_sql = nlp_cache.cached_generate_sql(question, schema_info)
             st.code(f"生成されたSQL:\n{raw_sql}")
             
             # Step 2: SQL検証
             st.write("**Step 2: SQL検証**")
             try:
-                safe_sql = sql_guard.sanitize_sql(raw_sql)
+                safe_sql = nlp_cache.cached_sanitize(raw_sql)
                 st.success("✅ SQL検証通過")
                 sql_to_use = safe_sql
             except Exception as e:
                 st.warning(f"⚠️ SQL検証失敗: {e}")
-                fallback_sql = sql_guard.get_fallback_query(question)
+                fallback_sql = nlp_cache.cached_fallback_query(question)
                 st.code(f"フォールバックSQL:\n{fallback_sql}")
                 sql_to_use = fallback_sql
             
             # Step 3: SQL実行
             st.write("**Step 3: SQL実行**")
             try:
-                result_df = st.session_state.con.execute(sql_to_use.strip()).df()
+                result_df = con.execute(sql_to_use).df()
                 st.success(f"✅ SQL実行成功: {len(result_df)}行取得")
                 
                 if not result_df.empty:
@@ -147,8 +134,7 @@ with col1:
                     
                     st.write("**Step 6: 要約**")
                     try:
-                        summary = llm_adapter.summarize(sql_to_use, result_df.head(5).to_string())
-                        st.write(summary)
+                        st.write_stream(llm_adapter.summarize_stream(sql_to_use, result_df.head(5).to_csv(index=False, sep='\t')))
                     except Exception as e:
                         st.warning(f"要約生成失敗: {e}")
                     
@@ -171,13 +157,13 @@ with col2:
         
         query = "SELECT region, SUM(revenue) as total_revenue FROM sales GROUP BY region ORDER BY total_revenue DESC"
         try:
-            result = st.session_state.con.execute(query).df()
+            # Display only, so the Arrow table goes straight to st.dataframe
+            result = con.execute(query).to_arrow_table()
             st.dataframe(result)
             
             # 北部を強調
-            north_row = result[result['region'] == 'North']
-            if not north_row.empty:
-                north_revenue = north_row['total_revenue'].iloc[0]
+            north_revenue = con.execute("SELECT SUM(revenue) FROM sales WHERE region = 'North'").fetchone()[0]
+            if north_revenue is not None:
                 st.success(f"✅ North地域確認: {north_revenue:,.0f}円")
             else:
                 st.error("❌ North地域が見つかりません")
@@ -190,12 +176,9 @@ with col3:
         st.write("**🔍 MockLLMAdapter動作確認**")
         
         # MockLLMAdapter の直接テスト
-        mock_adapter = llm_adapter.MockLLMAdapter()
-        
         test_questions = ["北部地域の売上", "北部の売上", "North sales"]
-        for q in test_questions:
-            sql = mock_adapter.generate_sql(q, st.session_state.schema_info)
-            st.code(f"質問: {q}\n生成SQL: {sql}")
+        results = [(q, mock_adapter.generate_sql(q, schema_info)) for q in test_questions]
+        st.code("\n\n".join(f"質問: {q}\n生成SQL: {sql}" for q, sql in results))
 
 # Regular chat interface
 st.subheader("💬 通常のチャット")
@@ -217,17 +200,17 @@ if prompt := st.chat_input("質問を入力してください"):
         
         try:
             # SQL生成
-            raw_sql = llm_adapter.generate_sql(prompt, st.session_state.schema_info)
+            raw_sql = nlp_cache.cached_generate_sql(prompt, schema_info)
             st.write(f"生成SQL: `{raw_sql}`")
             
             # 検証・実行
             try:
-                safe_sql = sql_guard.sanitize_sql(raw_sql)
+                safe_sql = nlp_cache.cached_sanitize(raw_sql)
             except:
-                safe_sql = sql_guard.get_fallback_query(prompt)
+                safe_sql = nlp_cache.cached_fallback_query(prompt)
                 st.warning("フォールバック使用")
             
-            result_df = st.session_state.con.execute(safe_sql.strip()).df()
+            result_df = con.execute(safe_sql).df()
             
             if not result_df.empty:
                 st.dataframe(result_df)
@@ -235,8 +218,7 @@ if prompt := st.chat_input("質問を入力してください"):
                 
                 # 要約
                 try:
-                    summary = llm_adapter.summarize(safe_sql, result_df.head(5).to_string())
-                    st.write(summary)
+                    st.write_stream(llm_adapter.summarize_stream(safe_sql, result_df.head(5).to_csv(index=False, sep='\t')))
                 except:
                     st.write("分析完了")
                 
@@ -4,29 +4,37 @@ Demo script for NL→SQL Sales Analysis Chatbot
 Demonstrates updated visualization logic with reference implementation
 """
 
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import duckdb
 import sql_guard
-import viz
 import llm_adapter
 
+@functools.lru_cache(maxsize=1)
+def _con():
+    """Load the sample data once; shared by main() and the visualization demo"""
+    con = duckdb.connect(':memory:')
+    con.execute("""
+        CREATE TABLE sales AS
+        SELECT * REPLACE (CAST(date AS TIMESTAMP) AS date)
+        FROM read_csv_auto('data/sample_sales.csv', header=True, sample_size=-1)
+    """)
+    con.execute("""
+        CREATE TABLE sales_with_month AS
+        SELECT *, date_trunc('month', date) as month
+        FROM sales
+    """)
+    return con
+
 def demo_visualization_logic():
     """Demonstrate the updated viz.auto_visualize reference implementation"""
     
     print("🎨 Visualization Logic Demo (Reference Implementation)")
     print("=" * 60)
     
-    # Setup data
-    df = pd.read_csv('data/sample_sales.csv')
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    
-    con = duckdb.connect(':memory:')
-    con.register('sales', df)
-    con.execute("""
-        CREATE VIEW sales_with_month AS
-        SELECT *, date_trunc('month', date) as month
-        FROM sales
-    """)
+    con = _con()
     
     # Test cases for the reference implementation
     test_cases = [
@@ -76,12 +84,17 @@ def demo_visualization_logic():
         }
     ]
     
-    for i, test in enumerate(test_cases, 1):
+    # Execute the independent queries concurrently, one cursor per thread
+    def run_query(sql):
+        return con.cursor().execute(sql).df()
+    
+    with ThreadPoolExecutor(max_workers=len(test_cases)) as ex:
+        results = list(ex.map(run_query, [t['sql'] for t in test_cases]))
+    
+    for i, (test, result_df) in enumerate(zip(test_cases, results), 1):
         print(f"\n📊 Test {i}: {test['name']}")
         print("-" * 40)
         
-        # Execute query
-        result_df = con.execute(test['sql']).df()
         print(f"Data shape: {result_df.shape}")
         print(f"Columns: {list(result_df.columns)}")
         
@@ -107,18 +120,16 @@ def demo_visualization_logic():
         val = next((c for c in preferred if c in result_df.columns), None)
         if val is None:
             # Look for any numeric column
-            for c in result_df.columns:
-                if pd.api.types.is_numeric_dtype(result_df[c]):
-                    val = c
-                    break
-        if val is None:
-            # Test string-to-numeric coercion
-            for c in result_df.columns:
-                coerced = viz._coerce_numeric(result_df[c])
-                if pd.api.types.is_numeric_dtype(coerced):
-                    val = c
-                    print(f"- String coerced to numeric: {c}")
-                    break
+            numeric_cols = result_df.select_dtypes(include="number").columns
+            if len(numeric_cols):
+                val = numeric_cols[0]
+            else:
+                # Test string-to-numeric coercion on all columns at once
+                coerced = result_df.apply(pd.to_numeric, errors="coerce")
+                numeric_cols = coerced.columns[coerced.notna().any()]
+                if len(numeric_cols):
+                    val = numeric_cols[0]
+                    print(f"- String coerced to numeric: {val}")
         
         print(f"- Detected value column: {val}")
         
@@ -164,20 +175,14 @@ def main():
     
     # Load data
     print("📊 Loading sample data...")
-    df = pd.read_csv('data/sample_sales.csv')
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    
-    # Setup database
-    con = duckdb.connect(':memory:')
-    con.register('sales', df)
-    con.execute("""
-        CREATE VIEW sales_with_month AS
-        SELECT *, date_trunc('month', date) as month
-        FROM sales
-    """)
-    
-    print(f"✅ Data loaded: {len(df)} rows, {len(df.columns)} columns")
-    print(f"📅 Date range: {df['date'].min().date()} to {df['date'].max().date()}")
+    con = _con()
+    
+    n_rows, min_date, max_date = con.execute(
+        "SELECT COUNT(*), MIN(date), MAX(date) FROM sales"
+    ).fetchone()
+    n_cols = len(con.execute("DESCRIBE sales").fetchall())
+    print(f"✅ Data loaded: {n_rows} rows, {n_cols} columns")
+    print(f"📅 Date range: {min_date.date()} to {max_date.date()}")
     print()
     
     # Demo the acceptance criteria queries
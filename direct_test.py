@@ -3,10 +3,9 @@
 Direct test for the specific "北部地域の売上" issue
 """
 import streamlit as st
-import pandas as pd
 import duckdb
 import llm_adapter
-import sql_guard
+import nlp_cache
 import os
 
 # Force MockLLMAdapter
@@ -15,21 +14,8 @@ os.environ.pop('ANTHROPIC_API_KEY', None)
 
 st.title("🔍 直接テスト：北部地域の売上")
 
-# Setup data
-@st.cache_data
-def setup_data():
-    df = pd.read_csv('data/sample_sales.csv')
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    
-    con = duckdb.connect(':memory:')
-    con.register('sales', df)
-    con.execute("""
-        CREATE VIEW sales_with_month AS
-        SELECT *, date_trunc('month', CAST(date AS TIMESTAMP)) as month
-        FROM sales
-    """)
-    
-    schema_info = """CREATE TABLE sales (
+# Hand-written schema text for the LLM
+schema_info = """CREATE TABLE sales (
       date TIMESTAMP,
       category TEXT,  
       units INTEGER,
@@ -39,11 +25,25 @@ def setup_data():
       customer_segment TEXT,
       revenue DOUBLE
     );
-    -- Helper view: sales_with_month has all columns plus month."""
-    
-    return df, con, schema_info
+    -- Helper table: sales_with_month has all columns plus month."""
+
+# Setup data
+@st.cache_resource
+def get_con():
+    con = duckdb.connect(':memory:')
+    con.execute("""
+        CREATE TABLE sales AS
+        SELECT * REPLACE (CAST(date AS TIMESTAMP) AS date)
+        FROM read_csv_auto('data/sample_sales.csv', header=True, sample_size=-1)
+    """)
+    con.execute("""
+        CREATE TABLE sales_with_month AS
+        SELECT *, date_trunc('month', CAST(date AS TIMESTAMP)) as month
+        FROM sales
+    """)
+    return con
 
-df, con, schema_info = setup_data()
+con = get_con().cursor()
 
 st.write("✅ データセットアップ完了")
 
@@ -58,13 +58,13 @@ if st.button("「北部地域の売上」をテスト"):
         # Step 1: Generate SQL
         st.write("**Step 1: SQL生成**")
         try:
-            raw_sql = llm_adapter.generate_sql(question, schema_info)
-            sql = sql_guard.sanitize_sql(raw_sql)
+            raw_sql = nlp_cache.cached_generate_sql(question, schema_info)
+            sql = nlp_cache.cached_sanitize(raw_sql)
             st.success(f"✅ SQL生成成功")
             st.code(sql, language='sql')
         except Exception as e:
             st.warning(f"⚠️ SQL生成でフォールバック使用: {e}")
-            sql = sql_guard.get_fallback_query(question)
+            sql = nlp_cache.cached_fallback_query(question)
             st.code(sql, language='sql')
         
         # Step 2: Execute SQL
@@ -82,18 +82,18 @@ if st.button("「北部地域の売上」をテスト"):
                 st.dataframe(result_df, use_container_width=True)
                 
                 # Specific revenue display
-                if 'total_revenue' in result_df.columns:
-                    revenue = result_df['total_revenue'].iloc[0] 
-                    region = result_df['region'].iloc[0]
+                if {'region', 'total_revenue'} <= set(result_df.columns):
+                    # Scalar lookups; the frame is already fetched for the table
+                    revenue = result_df.at[0, 'total_revenue']
+                    region = result_df.at[0, 'region']
                     st.metric(f"{region}地域売上", f"{revenue:,.0f}円")
                     st.balloons()
                 
                 # Step 4: Summary
                 st.write("**Step 4: 要約**")
                 try:
-                    data_preview = result_df.head(3).to_string()
-                    summary = llm_adapter.summarize(sql, data_preview)
-                    st.write(summary)
+                    data_preview = result_df.head(3).to_csv(index=False, sep='\t')
+                    st.write_stream(llm_adapter.summarize_stream(sql, data_preview))
                 except Exception as e:
                     st.warning(f"要約生成失敗: {e}")
                     
@@ -110,12 +110,12 @@ st.divider()
 st.subheader("🔧 データ確認")
 
 if st.button("全地域データを表示"):
-    all_regions = con.execute("SELECT region, COUNT(*) as count, SUM(revenue) as total FROM sales GROUP BY region ORDER BY region").df()
+    all_regions = con.execute("SELECT region, COUNT(*) as count, SUM(revenue) as total FROM sales GROUP BY region ORDER BY region").to_arrow_table()
     st.dataframe(all_regions)
     
     # 北部地域の確認
-    north_data = all_regions[all_regions['region'] == 'North']
-    if not north_data.empty:
-        st.success(f"✅ North地域確認: {north_data['total'].iloc[0]:,.0f}円 ({north_data['count'].iloc[0]}件)")
+    north_count, north_total = con.execute("SELECT COUNT(*), SUM(revenue) FROM sales WHERE region = 'North'").fetchone()
+    if north_count:
+        st.success(f"✅ North地域確認: {north_total:,.0f}円 ({north_count}件)")
     else:
         st.error("❌ North地域がデータにありません")
\ No newline at end of file
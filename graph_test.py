@@ -3,10 +3,8 @@
 Graph display test
 """
 import streamlit as st
-import pandas as pd
 import duckdb
-import llm_adapter
-import sql_guard
+import nlp_cache
 import viz
 import os
 
@@ -16,21 +14,8 @@ os.environ.pop('ANTHROPIC_API_KEY', None)
 
 st.title("📊 グラフ表示テスト")
 
-# Setup data
-@st.cache_data
-def setup_data():
-    df = pd.read_csv('data/sample_sales.csv')
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    
-    con = duckdb.connect(':memory:')
-    con.register('sales', df)
-    con.execute("""
-        CREATE VIEW sales_with_month AS
-        SELECT *, date_trunc('month', CAST(date AS TIMESTAMP)) as month
-        FROM sales
-    """)
-    
-    schema_info = """CREATE TABLE sales (
+# Hand-written schema text for the LLM
+schema_info = """CREATE TABLE sales (
       date TIMESTAMP,
       category TEXT,  
       units INTEGER,
@@ -40,11 +25,25 @@ def setup_data():
       customer_segment TEXT,
       revenue DOUBLE
     );
-    -- Helper view: sales_with_month has all columns plus month."""
-    
-    return df, con, schema_info
+    -- Helper table: sales_with_month has all columns plus month."""
+
+# Setup data
+@st.cache_resource
+def get_con():
+    con = duckdb.connect(':memory:')
+    con.execute("""
+        CREATE TABLE sales AS
+        SELECT * REPLACE (CAST(date AS TIMESTAMP) AS date)
+        FROM read_csv_auto('data/sample_sales.csv', header=True, sample_size=-1)
+    """)
+    con.execute("""
+        CREATE TABLE sales_with_month AS
+        SELECT *, date_trunc('month', CAST(date AS TIMESTAMP)) as month
+        FROM sales
+    """)
+    return con
 
-df, con, schema_info = setup_data()
+con = get_con().cursor()
 
 st.write("✅ データセットアップ完了")
 
@@ -56,34 +55,35 @@ test_queries = [
     ("月毎のカテゴリー別の売上", "月次トレンドの線グラフが表示されるはず")
 ]
 
-for question, expected in test_queries:
-    if st.button(f"テスト: {question}"):
-        st.write(f"**質問:** {question}")
-        st.write(f"**期待結果:** {expected}")
+expected_by_question = dict(test_queries)
+question = st.radio("テスト選択", list(expected_by_question))
+
+if st.button("実行"):
+    expected = expected_by_question[question]
+    st.write(f"**質問:** {question}")
+    st.write(f"**期待結果:** {expected}")
+    
+    try:
+        # Generate and execute SQL
+        sql = nlp_cache.cached_generate_sql(question, schema_info)
+        safe_sql = nlp_cache.cached_sanitize(sql)
+        result_df = con.execute(safe_sql).df()
         
-        try:
-            # Generate and execute SQL
-            sql = llm_adapter.generate_sql(question, schema_info)
-            safe_sql = sql_guard.sanitize_sql(sql)
-            result_df = con.execute(safe_sql).df()
+        st.code(sql, language='sql')
+        st.success(f"✅ {len(result_df)}行のデータを取得")
+        
+        if not result_df.empty:
+            st.write("**データテーブル:**")
+            st.dataframe(result_df, use_container_width=True)
             
-            st.code(sql, language='sql')
-            st.success(f"✅ {len(result_df)}行のデータを取得")
+            st.write("**グラフ:**")
+            try:
+                viz.auto_visualize(result_df)
+                st.success("✅ グラフ表示成功")
+            except Exception as e:
+                st.error(f"❌ グラフ表示失敗: {e}")
+        else:
+            st.error("❌ データが空")
             
-            if not result_df.empty:
-                st.write("**データテーブル:**")
-                st.dataframe(result_df, use_container_width=True)
-                
-                st.write("**グラフ:**")
-                try:
-                    viz.auto_visualize(result_df)
-                    st.success("✅ グラフ表示成功")
-                except Exception as e:
-                    st.error(f"❌ グラフ表示失敗: {e}")
-            else:
-                st.error("❌ データが空")
-                
-        except Exception as e:
-            st.error(f"❌ エラー: {e}")
-        
-        st.divider()
\ No newline at end of file
+    except Exception as e:
+        st.error(f"❌ エラー: {e}")
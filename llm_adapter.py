@@ -1,6 +1,16 @@
 import os
+import re
+import json
+import time
+import asyncio
+import hashlib
 import logging
-from typing import Optional
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from types import MappingProxyType
+from functools import lru_cache, wraps
+from typing import Dict, Iterator, List, Optional
 from abc import ABC, abstractmethod
 
 try:
@@ -13,48 +23,109 @@ try:
 except ImportError:
     anthropic = None
 
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Keep-alive pool settings for the API clients' HTTP connections
+HTTP_MAX_KEEPALIVE = 20
+HTTP_KEEPALIVE_EXPIRY = 300
 
-class LLMAdapter(ABC):
-    """Abstract base class for LLM adapters"""
-    
-    @abstractmethod
-    def generate_sql(self, question: str, schema: str) -> str:
-        """Generate SQL query from natural language question"""
-        pass
-    
-    @abstractmethod
-    def summarize(self, sql: str, data_preview: str) -> str:
-        """Generate summary of SQL results"""
-        pass
 
+def _http_client(sdk):
+    """Build an SDK-default httpx client with a larger keep-alive pool, if available"""
+    if httpx is None or not hasattr(sdk, "DefaultHttpxClient"):
+        return None
+    return sdk.DefaultHttpxClient(limits=httpx.Limits(
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    ))
 
-class OpenAIAdapter(LLMAdapter):
-    """OpenAI GPT adapter"""
-    
-    def __init__(self, api_key: str, model: str = "gpt-4o-mini"):
-        if openai is None:
-            raise ImportError("openai package not installed. Install with: pip install openai")
-        
-        self.client = openai.OpenAI(api_key=api_key)
-        self.model = model
-    
-    def generate_sql(self, question: str, schema: str) -> str:
-        """Generate SQL query from natural language question"""
-        system_prompt = f"""You are a careful data analyst. Convert the user's question into a single DuckDB SQL query.
+
+# Exact-match response cache for paid API calls (enabled with LLM_CACHE=1)
+LLM_CACHE_SIZE = 512
+_response_cache: "OrderedDict[str, str]" = OrderedDict()
+_response_cache_lock = threading.Lock()
+_disk_cache = None
+
+
+def _get_disk_cache():
+    """Get the optional on-disk cache, or None when it is not configured"""
+    global _disk_cache
+    cache_dir = os.getenv("LLM_CACHE_DIR")
+    if not cache_dir or diskcache is None:
+        return None
+    if _disk_cache is None:
+        _disk_cache = diskcache.Cache(cache_dir)
+    return _disk_cache
+
+
+def cached_response(method):
+    """
+    Cache an adapter method's response by a SHA-256 of its inputs
+
+    The key covers the adapter class, model, method name and both text
+    arguments, so different providers or prompts never share entries.
+    Errors are not cached.
+    """
+    @wraps(method)
+    def wrapper(self, first: str, second: str) -> str:
+        if os.getenv("LLM_CACHE") != "1":
+            return method(self, first, second)
+
+        key = hashlib.sha256("\x00".join(
+            (type(self).__name__, getattr(self, "model", ""), method.__name__, first, second)
+        ).encode("utf-8")).hexdigest()
+
+        with _response_cache_lock:
+            if key in _response_cache:
+                _response_cache.move_to_end(key)
+                return _response_cache[key]
+
+        disk = _get_disk_cache()
+        result = disk.get(key) if disk is not None else None
+        if result is None:
+            result = method(self, first, second)
+            if disk is not None:
+                disk.set(key, result)
+
+        with _response_cache_lock:
+            _response_cache[key] = result
+            if len(_response_cache) > LLM_CACHE_SIZE:
+                _response_cache.popitem(last=False)
+        return result
+
+    return wrapper
+
+
+# Seconds between status checks while waiting for a batch job
+BATCH_POLL_INTERVAL = 30
+
+
+# Most questions packed into one generate_sql_batch request
+MAX_PACKED_QUESTIONS = 20
+
+
+# Static part of the NL→SQL system prompt. It comes first and is byte-identical
+# on every call so the providers' prompt caches can reuse it; the schema follows.
+_SQL_SYSTEM_PROMPT_PREFIX = """You are a careful data analyst. Convert the user's question into a single DuckDB SQL query.
 Rules:
-- Use only the table 'sales' and helper view 'sales_with_month'.
+- Use only the table 'sales' and helper table 'sales_with_month'.
 - SELECT only. No PRAGMA/ATTACH/INSERT/UPDATE/DELETE/COPY/EXPORT/CREATE TABLE.
 - Prefer clear GROUP BY and snake_case aliases.
 - For monthly questions, use sales_with_month.month.
 - When returning raw rows, add LIMIT 5000.
 - Return ONLY SQL, no explanations or markdown.
 
-Schema:
-{schema}
-
 Examples:
 Q: 月毎のカテゴリー別の売上
 SQL:
@@ -75,7 +146,96 @@ SQL:
 select region, sum(revenue) as total_revenue
 from sales
 group by 1
-order by total_revenue desc;"""
+order by total_revenue desc;
+"""
+
+
+def _schema_section(schema: str) -> str:
+    """Build the variable tail of the NL→SQL system prompt"""
+    return f"Schema:\n{schema}"
+
+
+def _sql_system_prompt(schema: str) -> str:
+    """Build the NL→SQL system prompt shared by all API adapters"""
+    return f"{_SQL_SYSTEM_PROMPT_PREFIX}\n{_schema_section(schema)}"
+
+
+def _summary_prompt(sql: str, data_preview: str) -> str:
+    """Build the Japanese summarization prompt shared by all API adapters"""
+    return f"""以下のSQLクエリと結果データをもとに、日本語で一段落の要約を生成してください。数値は桁区切りを含めて読みやすくしてください。過度な断定は避け、データの特徴や傾向を簡潔に述べてください。
+
+SQL:
+{sql}
+
+データ (先頭部分):
+{data_preview}
+
+要約:"""
+
+
+class LLMAdapter(ABC):
+    """Abstract base class for LLM adapters"""
+    
+    @abstractmethod
+    def generate_sql(self, question: str, schema: str) -> str:
+        """Generate SQL query from natural language question"""
+        pass
+    
+    @abstractmethod
+    def summarize(self, sql: str, data_preview: str) -> str:
+        """Generate summary of SQL results"""
+        pass
+    
+    async def agenerate_sql(self, question: str, schema: str) -> str:
+        """Async generate_sql, run in a worker thread so calls can overlap"""
+        return await asyncio.to_thread(self.generate_sql, question, schema)
+    
+    async def asummarize(self, sql: str, data_preview: str) -> str:
+        """Async summarize, run in a worker thread so calls can overlap"""
+        return await asyncio.to_thread(self.summarize, sql, data_preview)
+    
+    def summarize_stream(self, sql: str, data_preview: str) -> Iterator[str]:
+        """Yield the summary in chunks as it is generated (all at once by default)"""
+        yield self.summarize(sql, data_preview)
+    
+    def generate_sql_batch(self, questions: List[str], schema: str) -> List[str]:
+        """Generate SQL for several questions (one call per question by default)"""
+        return [self.generate_sql(q, schema) for q in questions]
+    
+    def batch_summarize(self, items: List[Dict[str, str]]) -> List[Optional[str]]:
+        """
+        Summarize many results offline
+        
+        Args:
+            items: Dicts with 'sql' and 'data_preview' keys
+            
+        Returns:
+            One summary per item, in order (None where a request failed)
+        """
+        summaries: List[Optional[str]] = []
+        for item in items:
+            try:
+                summaries.append(self.summarize(item["sql"], item["data_preview"]))
+            except Exception as e:
+                logger.error(f"Batch summarization error: {e}")
+                summaries.append(None)
+        return summaries
+
+
+class OpenAIAdapter(LLMAdapter):
+    """OpenAI GPT adapter"""
+    
+    def __init__(self, api_key: str, model: str = "gpt-4o-mini"):
+        if openai is None:
+            raise ImportError("openai package not installed. Install with: pip install openai")
+        
+        self.client = openai.OpenAI(api_key=api_key, http_client=_http_client(openai))
+        self.model = model
+    
+    @cached_response
+    def generate_sql(self, question: str, schema: str) -> str:
+        """Generate SQL query from natural language question"""
+        system_prompt = _sql_system_prompt(schema)
 
         try:
             response = self.client.chat.completions.create(
@@ -92,17 +252,43 @@ order by total_revenue desc;"""
             logger.error(f"OpenAI API error: {e}")
             raise
     
+    def generate_sql_batch(self, questions: List[str], schema: str) -> List[str]:
+        """Generate SQL for several questions in a single chat completion"""
+        if not questions:
+            return []
+        if len(questions) > MAX_PACKED_QUESTIONS:
+            raise ValueError(f"At most {MAX_PACKED_QUESTIONS} questions per request, got {len(questions)}")
+        
+        numbered = "\n".join(f"{i}. {q}" for i, q in enumerate(questions, 1))
+        user_prompt = f"""Answer each question below with one SQL query.
+Return a JSON object {{"queries": [...]}} whose array holds one SQL string per question, in the same order.
+
+{numbered}"""
+        
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": _sql_system_prompt(schema)},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0.1,
+                max_tokens=300 * len(questions),
+                response_format={"type": "json_object"}
+            )
+            queries = json.loads(response.choices[0].message.content)["queries"]
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}")
+            raise
+        
+        if len(queries) != len(questions):
+            raise ValueError(f"Expected {len(questions)} queries, got {len(queries)}")
+        return [q.strip() for q in queries]
+    
+    @cached_response
     def summarize(self, sql: str, data_preview: str) -> str:
         """Generate summary of SQL results"""
-        prompt = f"""以下のSQLクエリと結果データをもとに、日本語で一段落の要約を生成してください。数値は桁区切りを含めて読みやすくしてください。過度な断定は避け、データの特徴や傾向を簡潔に述べてください。
-
-SQL:
-{sql}
-
-データ (先頭部分):
-{data_preview}
-
-要約:"""
+        prompt = _summary_prompt(sql, data_preview)
 
         try:
             response = self.client.chat.completions.create(
@@ -117,6 +303,70 @@ SQL:
         except Exception as e:
             logger.error(f"OpenAI summarization error: {e}")
             raise
+    
+    def summarize_stream(self, sql: str, data_preview: str) -> Iterator[str]:
+        """Yield the summary in chunks as OpenAI streams it"""
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "user", "content": _summary_prompt(sql, data_preview)}
+                ],
+                temperature=0.3,
+                max_tokens=300,
+                stream=True
+            )
+            for chunk in stream:
+                if chunk.choices:
+                    yield chunk.choices[0].delta.content or ""
+        except Exception as e:
+            logger.error(f"OpenAI summarization error: {e}")
+            raise
+    
+    def batch_summarize(self, items: List[Dict[str, str]]) -> List[Optional[str]]:
+        """Summarize many results through the OpenAI Batch API (half price, up to 24h)"""
+        lines = [
+            json.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model,
+                    "messages": [{"role": "user", "content": _summary_prompt(item["sql"], item["data_preview"])}],
+                    "temperature": 0.3,
+                    "max_tokens": 300,
+                },
+            }, ensure_ascii=False)
+            for i, item in enumerate(items)
+        ]
+        input_file = self.client.files.create(
+            file=("summaries.jsonl", BytesIO("\n".join(lines).encode("utf-8"))),
+            purpose="batch",
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        logger.info(f"OpenAI batch {batch.id} submitted with {len(items)} requests")
+        
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(BATCH_POLL_INTERVAL)
+            batch = self.client.batches.retrieve(batch.id)
+        if batch.status != "completed":
+            raise RuntimeError(f"OpenAI batch {batch.id} ended with status {batch.status}")
+        
+        results: List[Optional[str]] = [None] * len(items)
+        if batch.output_file_id:
+            for line in self.client.files.content(batch.output_file_id).text.splitlines():
+                record = json.loads(line)
+                body = (record.get("response") or {}).get("body") or {}
+                if body.get("choices"):
+                    results[int(record["custom_id"])] = body["choices"][0]["message"]["content"].strip()
+        failed = results.count(None)
+        if failed:
+            logger.warning(f"OpenAI batch {batch.id}: {failed} of {len(items)} summaries failed")
+        return results
 
 
 class AnthropicAdapter(LLMAdapter):
@@ -126,44 +376,13 @@ class AnthropicAdapter(LLMAdapter):
         if anthropic is None:
             raise ImportError("anthropic package not installed. Install with: pip install anthropic")
         
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self.client = anthropic.Anthropic(api_key=api_key, http_client=_http_client(anthropic))
         self.model = model
     
+    @cached_response
     def generate_sql(self, question: str, schema: str) -> str:
         """Generate SQL query from natural language question"""
-        system_prompt = f"""You are a careful data analyst. Convert the user's question into a single DuckDB SQL query.
-Rules:
-- Use only the table 'sales' and helper view 'sales_with_month'.
-- SELECT only. No PRAGMA/ATTACH/INSERT/UPDATE/DELETE/COPY/EXPORT/CREATE TABLE.
-- Prefer clear GROUP BY and snake_case aliases.
-- For monthly questions, use sales_with_month.month.
-- When returning raw rows, add LIMIT 5000.
-- Return ONLY SQL, no explanations or markdown.
-
-Schema:
-{schema}
-
-Examples:
-Q: 月毎のカテゴリー別の売上
-SQL:
-select month, category, sum(revenue) as total_revenue
-from sales_with_month
-group by 1,2
-order by 1,2;
-
-Q: チャネルごとの売上
-SQL:
-select sales_channel, sum(revenue) as total_revenue
-from sales
-group by 1
-order by total_revenue desc;
-
-Q: 地域ごとの売上の合計
-SQL:
-select region, sum(revenue) as total_revenue
-from sales
-group by 1
-order by total_revenue desc;"""
+        system_prompt = _sql_system_prompt(schema)
 
         try:
             response = self.client.messages.create(
@@ -180,17 +399,10 @@ order by total_revenue desc;"""
             logger.error(f"Anthropic API error: {e}")
             raise
     
+    @cached_response
     def summarize(self, sql: str, data_preview: str) -> str:
         """Generate summary of SQL results"""
-        prompt = f"""以下のSQLクエリと結果データをもとに、日本語で一段落の要約を生成してください。数値は桁区切りを含めて読みやすくしてください。過度な断定は避け、データの特徴や傾向を簡潔に述べてください。
-
-SQL:
-{sql}
-
-データ (先頭部分):
-{data_preview}
-
-要約:"""
+        prompt = _summary_prompt(sql, data_preview)
 
         try:
             response = self.client.messages.create(
@@ -205,6 +417,51 @@ SQL:
         except Exception as e:
             logger.error(f"Anthropic summarization error: {e}")
             raise
+    
+    def summarize_stream(self, sql: str, data_preview: str) -> Iterator[str]:
+        """Yield the summary in chunks as Anthropic streams it"""
+        try:
+            with self.client.messages.stream(
+                model=self.model,
+                max_tokens=300,
+                temperature=0.3,
+                messages=[
+                    {"role": "user", "content": _summary_prompt(sql, data_preview)}
+                ]
+            ) as stream:
+                yield from stream.text_stream
+        except Exception as e:
+            logger.error(f"Anthropic summarization error: {e}")
+            raise
+    
+    def batch_summarize(self, items: List[Dict[str, str]]) -> List[Optional[str]]:
+        """Summarize many results through the Anthropic Message Batches API"""
+        batch = self.client.messages.batches.create(requests=[
+            {
+                "custom_id": str(i),
+                "params": {
+                    "model": self.model,
+                    "max_tokens": 300,
+                    "temperature": 0.3,
+                    "messages": [{"role": "user", "content": _summary_prompt(item["sql"], item["data_preview"])}],
+                },
+            }
+            for i, item in enumerate(items)
+        ])
+        logger.info(f"Anthropic batch {batch.id} submitted with {len(items)} requests")
+        
+        while batch.processing_status != "ended":
+            time.sleep(BATCH_POLL_INTERVAL)
+            batch = self.client.messages.batches.retrieve(batch.id)
+        
+        results: List[Optional[str]] = [None] * len(items)
+        for entry in self.client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                results[int(entry.custom_id)] = entry.result.message.content[0].text.strip()
+        failed = results.count(None)
+        if failed:
+            logger.warning(f"Anthropic batch {batch.id}: {failed} of {len(items)} summaries failed")
+        return results
 
 
 def create_llm_adapter() -> LLMAdapter:
@@ -217,7 +474,7 @@ def create_llm_adapter() -> LLMAdapter:
         if not api_key:
             logger.warning("OPENAI_API_KEY not set - falling back to mock responses")
             return MockLLMAdapter()
-        return OpenAIAdapter(api_key, model)
+        return _build_adapter(provider, api_key, model)
     
     elif provider == "anthropic":
         api_key = os.getenv("ANTHROPIC_API_KEY")
@@ -225,46 +482,88 @@ def create_llm_adapter() -> LLMAdapter:
         if not api_key:
             logger.warning("ANTHROPIC_API_KEY not set - falling back to mock responses")
             return MockLLMAdapter()
-        return AnthropicAdapter(api_key, model)
+        return _build_adapter(provider, api_key, model)
     
     else:
         logger.warning(f"Unknown LLM provider: {provider} - falling back to mock responses")
         return MockLLMAdapter()
 
 
+@lru_cache(maxsize=4)
+def _build_adapter(provider: str, api_key: str, model: str) -> LLMAdapter:
+    """Construct an API adapter once per configuration so its HTTP client stays warm"""
+    if provider == "anthropic":
+        return AnthropicAdapter(api_key, model)
+    return OpenAIAdapter(api_key, model)
+
+
 class MockLLMAdapter(LLMAdapter):
     """Mock LLM adapter for testing without API keys"""
     
+    # Question keywords mapped to intent tags; region keywords map to the region name
+    _KEYWORD_TAGS = MappingProxyType({
+        '北部': 'North', '北': 'North', 'north': 'North',
+        '南部': 'South', '南': 'South', 'south': 'South',
+        '東部': 'East', '東': 'East', 'east': 'East',
+        '西部': 'West', '西': 'West', 'west': 'West',
+        '月': 'month', 'month': 'month', '月毎': 'month', '月別': 'month',
+        'カテゴリ': 'category', 'category': 'category',
+        'electronics': 'category_name', 'clothing': 'category_name',
+        'チャネル': 'channel', 'channel': 'channel', 'オンライン': 'channel',
+        'online': 'channel', '店舗': 'channel', 'store': 'channel',
+        '地域': 'region', 'region': 'region', '地方': 'region',
+    })
+
+    # Regions in the order they take precedence when a question names several
+    _REGION_NAMES = ('North', 'South', 'East', 'West')
+    # One overlapping-match alternation so the question is scanned once
+    _KEYWORD_RE = re.compile(
+        "(?=(" + "|".join(sorted(map(re.escape, _KEYWORD_TAGS), key=len, reverse=True)) + "))"
+    )
+
+    # Summaries for region-filtered SQL, checked in precedence order
+    _REGION_SUMMARIES = (
+        ("north", "北部地域の売上データを分析しました。表とグラフから詳細な売上状況を確認できます。"),
+        ("south", "南部地域の売上データを分析しました。表とグラフから詳細な売上状況を確認できます。"),
+        ("east", "東部地域の売上データを分析しました。表とグラフから詳細な売上状況を確認できます。"),
+        ("west", "西部地域の売上データを分析しました。表とグラフから詳細な売上状況を確認できます。"),
+    )
+    # Summaries keyed on a keyword of the (lower-cased) SQL, checked in order
+    _SUMMARY_RULES = (
+        ("sales_channel", "販売チャネル別の売上データを分析しました。オンラインと店舗の売上を比較できます。"),
+        ("category", "カテゴリ別の売上データを分析しました。各商品カテゴリの売上実績を確認できます。"),
+        ("month", "月次売上トレンドを分析しました。時系列での売上推移を確認できます。"),
+    )
+    
     def generate_sql(self, question: str, schema: str) -> str:
         """Generate SQL query from natural language question using simple heuristics"""
-        question_lower = question.lower()
+        return self._classify(question)
+    
+    @classmethod
+    @lru_cache(maxsize=1024)
+    def _classify(cls, question: str) -> str:
+        """Map a question to its heuristic SQL; memoized since it ignores the schema"""
+        hits = {cls._KEYWORD_TAGS[m.group(1)] for m in cls._KEYWORD_RE.finditer(question.lower())}
         
         # Specific region queries - map Japanese terms to English region names
-        region_map = {
-            '北部': 'North', '北': 'North', 'north': 'North',
-            '南部': 'South', '南': 'South', 'south': 'South', 
-            '東部': 'East', '東': 'East', 'east': 'East',
-            '西部': 'West', '西': 'West', 'west': 'West'
-        }
-        
-        for keyword, region in region_map.items():
-            if keyword in question_lower:
+        for region in cls._REGION_NAMES:
+            if region in hits:
                 return f"SELECT region, SUM(revenue) as total_revenue FROM sales WHERE region = '{region}' GROUP BY 1 ORDER BY total_revenue DESC"
         
         # Monthly category analysis
-        if any(k in question_lower for k in ['月', 'month', '月毎', '月別']) and any(k in question_lower for k in ['カテゴリ', 'category']):
+        if 'month' in hits and 'category' in hits:
             return "SELECT month, category, SUM(revenue) as total_revenue FROM sales_with_month GROUP BY 1,2 ORDER BY 1,2"
         
         # Channel analysis
-        if any(k in question_lower for k in ['チャネル', 'channel', 'オンライン', 'online', '店舗', 'store']):
+        if 'channel' in hits:
             return "SELECT sales_channel, SUM(revenue) as total_revenue FROM sales GROUP BY 1 ORDER BY total_revenue DESC"
         
         # Category analysis
-        if any(k in question_lower for k in ['カテゴリ', 'category', 'electronics', 'clothing']):
+        if 'category' in hits or 'category_name' in hits:
             return "SELECT category, SUM(revenue) as total_revenue FROM sales GROUP BY 1 ORDER BY total_revenue DESC"
         
         # Region analysis (general)
-        if any(k in question_lower for k in ['地域', 'region', '地方']):
+        if 'region' in hits:
             return "SELECT region, SUM(revenue) as total_revenue FROM sales GROUP BY 1 ORDER BY total_revenue DESC"
         
         # Default to region summary
@@ -272,24 +571,15 @@ class MockLLMAdapter(LLMAdapter):
     
     def summarize(self, sql: str, data_preview: str) -> str:
         """Generate simple summary without LLM"""
-        if "where region" in sql.lower():
-            if "north" in sql.lower():
-                return "北部地域の売上データを分析しました。表とグラフから詳細な売上状況を確認できます。"
-            elif "south" in sql.lower():
-                return "南部地域の売上データを分析しました。表とグラフから詳細な売上状況を確認できます。"
-            elif "east" in sql.lower():
-                return "東部地域の売上データを分析しました。表とグラフから詳細な売上状況を確認できます。"
-            elif "west" in sql.lower():
-                return "西部地域の売上データを分析しました。表とグラフから詳細な売上状況を確認できます。"
-        
-        if "sales_channel" in sql.lower():
-            return "販売チャネル別の売上データを分析しました。オンラインと店舗の売上を比較できます。"
+        low = sql.lower()
+        if "where region" in low:
+            for region, summary in self._REGION_SUMMARIES:
+                if region in low:
+                    return summary
         
-        if "category" in sql.lower():
-            return "カテゴリ別の売上データを分析しました。各商品カテゴリの売上実績を確認できます。"
-        
-        if "month" in sql.lower():
-            return "月次売上トレンドを分析しました。時系列での売上推移を確認できます。"
+        for keyword, summary in self._SUMMARY_RULES:
+            if keyword in low:
+                return summary
         
         return "売上データの分析結果を表とグラフで確認できます。詳細な数値は上記の表をご参照ください。"
 
@@ -297,11 +587,57 @@ class MockLLMAdapter(LLMAdapter):
 # Convenience functions
 def generate_sql(question: str, schema: str) -> str:
     """Generate SQL query from natural language question"""
-    adapter = create_llm_adapter()
+    # Imported here because semantic_cache builds on this module
+    from semantic_cache import wrap_adapter
+    adapter = wrap_adapter(create_llm_adapter())
     return adapter.generate_sql(question, schema)
 
 
 def summarize(sql: str, data_preview: str) -> str:
     """Generate summary of SQL results"""
     adapter = create_llm_adapter()
-    return adapter.summarize(sql, data_preview)
\ No newline at end of file
+    return adapter.summarize(sql, data_preview)
+
+
+def summarize_stream(sql: str, data_preview: str) -> Iterator[str]:
+    """Stream the summary of SQL results in chunks"""
+    adapter = create_llm_adapter()
+    return adapter.summarize_stream(sql, data_preview)
+
+
+def batch_summarize(items: List[Dict[str, str]]) -> List[Optional[str]]:
+    """Summarize many SQL results offline (batch API where the provider has one)"""
+    adapter = create_llm_adapter()
+    return adapter.batch_summarize(items)
+
+
+# Maximum number of LLM requests in flight for batch helpers
+MAX_CONCURRENCY = 10
+
+
+async def batch_generate(questions: List[str], schema: str, max_concurrency: int = MAX_CONCURRENCY) -> List[str]:
+    """
+    Generate SQL for several questions concurrently
+    
+    Args:
+        questions: Natural language questions
+        schema: Database schema information
+        max_concurrency: Maximum number of requests in flight
+        
+    Returns:
+        Generated SQL queries, in the same order as ``questions``
+    """
+    from semantic_cache import wrap_adapter
+    adapter = wrap_adapter(create_llm_adapter())
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def generate(question: str) -> str:
+        async with semaphore:
+            return await adapter.agenerate_sql(question, schema)
+    
+    return await asyncio.gather(*[generate(q) for q in questions])
+
+
+def generate_sql_concurrent(questions: List[str], schema: str) -> List[str]:
+    """Synchronous wrapper around batch_generate (one request per question)"""
+    return asyncio.run(batch_generate(questions, schema))
\ No newline at end of file
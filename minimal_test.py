@@ -3,9 +3,9 @@
 Minimal test to verify the specific issue with 北部地域の売上
 """
 import streamlit as st
-import pandas as pd
 import duckdb
 import llm_adapter
+import sales_data
 import sql_guard
 
 # Force MockLLMAdapter by clearing keys
@@ -15,15 +15,12 @@ os.environ.pop('ANTHROPIC_API_KEY', None)
 
 st.title("🔍 北部地域売上テスト")
 
-@st.cache_data
+@st.cache_resource
 def setup_data():
-    df = pd.read_csv('data/sample_sales.csv')
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    
     con = duckdb.connect(':memory:')
-    con.register('sales', df)
+    sales_data.create_sales_table(con)
     con.execute("""
-        CREATE VIEW sales_with_month AS
+        CREATE TABLE sales_with_month AS
         SELECT *, date_trunc('month', CAST(date AS TIMESTAMP)) as month
         FROM sales
     """)
@@ -38,13 +35,14 @@ def setup_data():
       customer_segment TEXT,
       revenue DOUBLE
     );
-    -- Helper view: sales_with_month has all columns plus month."""
+    -- Helper table: sales_with_month has all columns plus month."""
     
-    return df, con, schema_info
+    return con, schema_info
 
-df, con, schema_info = setup_data()
+con, schema_info = setup_data()
 
-st.write(f"✅ データ読み込み: {len(df)}行")
+n_rows = con.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+st.write(f"✅ データ読み込み: {n_rows}行")
 
 # Test specific query
 question = "北部地域の売上"
@@ -59,16 +57,17 @@ st.code(sql)
 st.write("**Step 2: SQL検証**")
 try:
     safe_sql = sql_guard.sanitize_sql(sql)
+    params = []
     st.success("✅ SQL検証通過")
 except Exception as e:
     st.error(f"❌ SQL検証失敗: {e}")
-    safe_sql = sql_guard.get_fallback_query(question)
-    st.code(f"フォールバック: {safe_sql}")
+    safe_sql, params = sql_guard.get_fallback_query_params(question)
+    st.code(f"フォールバック: {safe_sql}\nパラメータ: {params}")
 
 # Step 3: SQL実行
 st.write("**Step 3: SQL実行**")
 try:
-    result_df = con.execute(safe_sql).df()
+    result_df = con.execute(safe_sql, params).df()
     st.success(f"✅ 実行成功: {len(result_df)}行")
     if not result_df.empty:
         st.dataframe(result_df)
@@ -0,0 +1,50 @@
+import streamlit as st
+
+import llm_adapter
+import sql_guard
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_generate_sql(question: str, schema_info: str) -> str:
+    """
+    Cached llm_adapter.generate_sql, keyed on the question and schema text
+
+    Args:
+        question: Natural language question
+        schema_info: Database schema information
+
+    Returns:
+        Generated SQL query
+    """
+    return llm_adapter.generate_sql(question, schema_info)
+
+
+@st.cache_data(show_spinner=False)
+def cached_sanitize(sql: str) -> str:
+    """
+    Cached sql_guard.sanitize_sql
+
+    Validation failures are not cached; the SQLValidationError is raised
+    again on every call.
+
+    Args:
+        sql: SQL query to sanitize
+
+    Returns:
+        Sanitized SQL query
+    """
+    return sql_guard.sanitize_sql(sql)
+
+
+@st.cache_data(show_spinner=False)
+def cached_fallback_query(question: str) -> str:
+    """
+    Cached sql_guard.get_fallback_query
+
+    Args:
+        question: User's original question
+
+    Returns:
+        Safe fallback SQL query
+    """
+    return sql_guard.get_fallback_query(question)
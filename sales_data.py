@@ -0,0 +1,217 @@
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+import duckdb
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default location of the sample sales data
+DATA_FILE = "data/sample_sales.csv"
+
+# Low-cardinality string columns stored as pandas Categorical
+CATEGORICAL_COLUMNS = ("category", "region", "sales_channel", "customer_segment")
+
+# Format of the CSV's date column; passing it skips per-row format inference
+DATE_FORMAT = "%Y-%m-%d"
+
+# Numeric columns narrowed from the 64-bit defaults (prices are whole yen)
+NUMERIC_DTYPES = {"units": "int32", "unit_price": "int32", "revenue": "int32"}
+
+
+def _optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert dimension columns to Categorical and narrow numeric columns"""
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col, dtype in NUMERIC_DTYPES.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+    """Optimize dtypes and order rows by date so date ranges can be sliced"""
+    df = _optimize_dtypes(df)
+    if not df["date"].is_monotonic_increasing:
+        df = df.sort_values("date", kind="mergesort", ignore_index=True)
+    return df
+
+
+def fast_isin(series: pd.Series, values) -> np.ndarray:
+    """
+    Boolean mask equivalent to ``series.isin(values)``
+
+    Categorical columns are matched on their integer codes with a lookup
+    table instead of comparing strings row by row.
+
+    Args:
+        series: Column to test
+        values: Values to look for
+
+    Returns:
+        Boolean NumPy array, one entry per row of ``series``
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        sel_codes = series.cat.categories.get_indexer(list(values))
+        return np.isin(series.cat.codes.to_numpy(), sel_codes[sel_codes >= 0], kind="table")
+    return series.isin(values).to_numpy()
+
+
+def _parquet_is_fresh(csv_path: Path, parquet_path: Path) -> bool:
+    """Whether the Parquet copy exists and is at least as new as the CSV"""
+    return parquet_path.exists() and parquet_path.stat().st_mtime >= csv_path.stat().st_mtime
+
+
+def _read_csv(csv_path: Path) -> pd.DataFrame:
+    """Read the sales CSV with parsed dates and optimized dtypes"""
+    return _prepare(pd.read_csv(csv_path, parse_dates=["date"], date_format=DATE_FORMAT))
+
+
+def _write_parquet(df: pd.DataFrame, parquet_path: Path) -> bool:
+    """
+    Write the Parquet copy atomically
+
+    Returns:
+        True if the file was written, False if the directory is not writable
+    """
+    try:
+        # Write to a temporary file and swap it in, so concurrent readers never
+        # see a half-written Parquet file
+        tmp_path = parquet_path.with_name(f".{parquet_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, parquet_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+    except (OSError, ImportError) as e:
+        # Read-only deployments still work, just without the Parquet fast path
+        logger.warning(f"Could not write Parquet cache {parquet_path}: {e}")
+        return False
+    return True
+
+
+@st.cache_data(show_spinner=False)
+def load_sales(path: str = DATA_FILE) -> pd.DataFrame:
+    """
+    Load sales data, converting the CSV to Parquet on first use
+
+    The Parquet copy is written next to the CSV and rebuilt whenever the CSV
+    is newer, so later loads skip CSV parsing and date inference entirely.
+
+    Args:
+        path: Path to the sales CSV file
+
+    Returns:
+        Sales DataFrame sorted by its datetime ``date`` column, with
+        Categorical dimension columns and int32 numeric columns
+    """
+    csv_path = Path(path)
+    parquet_path = csv_path.with_suffix(".parquet")
+
+    if _parquet_is_fresh(csv_path, parquet_path):
+        return _prepare(pd.read_parquet(parquet_path))
+
+    df = _read_csv(csv_path)
+    _write_parquet(df, parquet_path)
+    return df
+
+
+def ensure_parquet(path: str = DATA_FILE) -> Optional[str]:
+    """
+    Make sure the Parquet copy of the sales CSV exists and is up to date
+
+    Only converts when the copy is missing or older than the CSV; an
+    up-to-date copy is not read at all.
+
+    Args:
+        path: Path to the sales CSV file
+
+    Returns:
+        Path of the Parquet copy, or None when it could not be written
+    """
+    csv_path = Path(path)
+    parquet_path = csv_path.with_suffix(".parquet")
+    if not _parquet_is_fresh(csv_path, parquet_path):
+        if not _write_parquet(_read_csv(csv_path), parquet_path):
+            return None
+    return str(parquet_path)
+
+
+def scan_path(path: str = DATA_FILE) -> str:
+    """
+    Get the file DuckDB should scan for the sales data
+
+    Args:
+        path: Path to the sales CSV file
+
+    Returns:
+        Path of the Parquet copy, or the CSV itself when the Parquet copy
+        could not be written
+    """
+    return ensure_parquet(path) or path
+
+
+def create_sales_table(con: duckdb.DuckDBPyConnection, path: str = DATA_FILE) -> None:
+    """
+    Create table 'sales' by letting DuckDB scan the data file directly
+
+    Args:
+        con: DuckDB connection to create the table in
+        path: Path to the sales CSV file
+    """
+    parquet_path = ensure_parquet(path)
+    if parquet_path is not None:
+        con.execute("CREATE TABLE sales AS SELECT * FROM read_parquet(?)", [parquet_path])
+    else:
+        con.execute("CREATE TABLE sales AS SELECT * FROM read_csv_auto(?)", [path])
+
+
+@st.cache_data(show_spinner=False)
+def filter_options(path: str = DATA_FILE) -> dict[str, list[str]]:
+    """
+    Get the distinct values of each dimension column for filter widgets
+
+    Args:
+        path: Path to the sales CSV file
+
+    Returns:
+        Mapping of column name to its sorted distinct values
+    """
+    df = load_sales(path)
+    return {col: df[col].cat.categories.tolist() for col in CATEGORICAL_COLUMNS if col in df.columns}
+
+
+@st.cache_resource(show_spinner=False)
+def get_con(path: str = DATA_FILE) -> duckdb.DuckDBPyConnection:
+    """
+    Get a DuckDB connection, shared across sessions, holding the sales table
+
+    Callers should query through ``get_con().cursor()`` so that concurrent
+    sessions do not share a single connection object.
+
+    Args:
+        path: Path to the sales CSV file
+
+    Returns:
+        In-memory DuckDB connection with the data loaded as table 'sales'
+        and the helper table 'sales_with_month'
+    """
+    con = duckdb.connect(':memory:')
+    con.register('sales_df', load_sales(path))
+    con.execute("CREATE TABLE sales AS SELECT * FROM sales_df")
+    con.unregister('sales_df')
+    con.execute("""
+        CREATE TABLE sales_with_month AS
+        SELECT *, date_trunc('month', CAST(date AS TIMESTAMP)) as month
+        FROM sales
+    """)
+    logger.info("Sales table loaded into DuckDB")
+    return con
@@ -1,12 +1,18 @@
 import streamlit as st
-import pandas as pd
+
+from sales_data import load_sales
 
 st.title('Pandas基礎')
 st.write('Pandasを使ってCSVファイルを読み込み、表示してみましょう！')
 
-# CSVファイルを読み込む
+# 統計情報は再実行のたびに計算しないようキャッシュする
+@st.cache_data
+def describe_sales():
+    return load_sales().describe(include='number')
+
+# CSVファイルを読み込む（読み込み結果はキャッシュされる）
 try:
-    df = pd.read_csv('data/sample_sales.csv')
+    df = load_sales()
     st.success('CSVファイルの読み込みに成功しました！')
 
     # 読み込んだデータの最初の5行を表示する
@@ -15,7 +21,7 @@ try:
 
     # 各列の統計情報を確認する
     st.subheader('各列の統計情報')
-    st.dataframe(df.describe())
+    st.dataframe(describe_sales())
 
 except FileNotFoundError:
     st.error('data/sample_sales.csv が見つかりません。ファイルパスを確認してください。')
@@ -1,21 +1,25 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 
+from sales_data import load_sales
+
 # アプリのタイトルと説明
 st.title('Plotly基礎')
 st.write('Plotlyを使ってインタラクティブなグラフを作成してみましょう！')
 
-# CSVファイルを読み込む
-df = pd.read_csv('data/sample_sales.csv')
+# CSVファイルを読み込み、カテゴリ別の合計を計算する（結果はキャッシュされ再実行時は再計算しない）
+@st.cache_data
+def load_category_revenue():
+    df = load_sales()
+    # 1. 'category' 列でデータをグループ化します。（observed=True で実在するカテゴリのみ）
+    # 2. グループごとに'revenue'列の合計値（sum）を計算します。
+    # 3. reset_index()でカテゴリを通常の列に戻します。
+    return df.groupby('category', observed=True)['revenue'].sum().reset_index()
 
 st.subheader('カテゴリ別合計売上グラフ')
 
 # Pandasでカテゴリごとの合計売上を計算
-# 1. 'category' 列でデータをグループ化します。
-# 2. グループごとに'revenue'列の合計値（sum）を計算します。
-# 3. reset_index()でカテゴリを通常の列に戻します。
-category_revenue = df.groupby('category')['revenue'].sum().reset_index()
+category_revenue = load_category_revenue()
 
 # Plotlyで棒グラフを作成
 # x軸にカテゴリ、y軸に合計売上を設定します。
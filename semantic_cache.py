@@ -0,0 +1,220 @@
+import asyncio
+import atexit
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+import llm_adapter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Multilingual model so Japanese paraphrases land close together
+EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+
+# Minimum cosine similarity for a cached SQL to be reused
+SIMILARITY_THRESHOLD = 0.92
+
+
+class SemanticCache:
+    """In-memory question → SQL cache matched by embedding similarity"""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, threshold: float = SIMILARITY_THRESHOLD):
+        if SentenceTransformer is None:
+            raise ImportError("sentence-transformers package not installed. Install with: pip install sentence-transformers")
+
+        self.model = SentenceTransformer(model_name)
+        self.threshold = threshold
+        self.embeddings: Optional[np.ndarray] = None
+        self.schemas: List[str] = []
+        self.sqls: List[str] = []
+        self._lock = threading.Lock()
+
+    def _encode(self, question: str) -> np.ndarray:
+        return self.model.encode(question, normalize_embeddings=True).astype(np.float32)
+
+    def lookup(self, question: str, schema: str) -> Optional[str]:
+        """
+        Find SQL cached for a similar question against the same schema
+
+        Args:
+            question: Natural language question
+            schema: Database schema information
+
+        Returns:
+            Cached SQL, or None when no entry is similar enough
+        """
+        query = self._encode(question)
+        # Snapshot under the lock so a concurrent insert cannot leave the
+        # embeddings and entry lists out of step while they are scanned
+        with self._lock:
+            embeddings, schemas, sqls = self.embeddings, list(self.schemas), list(self.sqls)
+        if embeddings is None:
+            return None
+
+        scores = embeddings @ query
+        for i in np.argsort(scores)[::-1]:
+            if scores[i] < self.threshold:
+                break
+            if schemas[i] == schema:
+                return sqls[i]
+        return None
+
+    def insert(self, question: str, schema: str, sql: str) -> None:
+        """Add a generated SQL query to the cache"""
+        emb = self._encode(question)[np.newaxis, :]
+        with self._lock:
+            self.embeddings = emb if self.embeddings is None else np.vstack([self.embeddings, emb])
+            self.schemas.append(schema)
+            self.sqls.append(sql)
+
+    def save(self, path: str) -> None:
+        """Write the cache to ``path`` (.npy) and its entries alongside as JSON"""
+        with self._lock:
+            embeddings, schemas, sqls = self.embeddings, list(self.schemas), list(self.sqls)
+        if embeddings is None:
+            return
+        npy_path = Path(path).with_suffix(".npy")
+        np.save(npy_path, embeddings)
+        entries = [{"schema": s, "sql": q} for s, q in zip(schemas, sqls)]
+        npy_path.with_suffix(".json").write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+
+    def load(self, path: str) -> None:
+        """Restore a cache written by ``save``"""
+        npy_path = Path(path).with_suffix(".npy")
+        embeddings = np.load(npy_path)
+        entries = json.loads(npy_path.with_suffix(".json").read_text(encoding="utf-8"))
+        with self._lock:
+            self.embeddings = embeddings
+            self.schemas = [e["schema"] for e in entries]
+            self.sqls = [e["sql"] for e in entries]
+
+
+class SemanticCachingAdapter(llm_adapter.LLMAdapter):
+    """Adapter decorator that answers similar questions from a SemanticCache"""
+
+    def __init__(self, inner: llm_adapter.LLMAdapter, cache: SemanticCache):
+        self.inner = inner
+        self.cache = cache
+
+    def generate_sql(self, question: str, schema: str) -> str:
+        """Generate SQL, reusing the SQL of a near-duplicate question if cached"""
+        sql = self.cache.lookup(question, schema)
+        if sql is not None:
+            logger.info(f"Semantic cache hit: {question}")
+            return sql
+
+        sql = self.inner.generate_sql(question, schema)
+        self.cache.insert(question, schema, sql)
+        return sql
+
+    def generate_sql_batch(self, questions: List[str], schema: str) -> List[str]:
+        """Generate SQL for several questions, sending only cache misses to the inner adapter"""
+        sqls = [self.cache.lookup(q, schema) for q in questions]
+        misses = [i for i, sql in enumerate(sqls) if sql is None]
+        if len(misses) < len(questions):
+            logger.info(f"Semantic cache hits: {len(questions) - len(misses)}/{len(questions)}")
+        if misses:
+            generated = self.inner.generate_sql_batch([questions[i] for i in misses], schema)
+            for i, sql in zip(misses, generated):
+                sqls[i] = sql
+                self.cache.insert(questions[i], schema, sql)
+        return sqls
+
+    async def agenerate_sql(self, question: str, schema: str) -> str:
+        """Async generate_sql, reusing cached SQL and awaiting the inner adapter on a miss"""
+        sql = await asyncio.to_thread(self.cache.lookup, question, schema)
+        if sql is not None:
+            logger.info(f"Semantic cache hit: {question}")
+            return sql
+
+        sql = await self.inner.agenerate_sql(question, schema)
+        await asyncio.to_thread(self.cache.insert, question, schema, sql)
+        return sql
+
+    def summarize(self, sql: str, data_preview: str) -> str:
+        """Generate summary of SQL results"""
+        return self.inner.summarize(sql, data_preview)
+
+    async def asummarize(self, sql: str, data_preview: str) -> str:
+        """Async summarize via the inner adapter"""
+        return await self.inner.asummarize(sql, data_preview)
+
+    def summarize_stream(self, sql: str, data_preview: str) -> Iterator[str]:
+        """Stream the summary from the inner adapter"""
+        return self.inner.summarize_stream(sql, data_preview)
+
+    def batch_summarize(self, items: List[Dict[str, str]]) -> List[Optional[str]]:
+        """Summarize many results through the inner adapter's batch path"""
+        return self.inner.batch_summarize(items)
+
+
+_cache: Optional[SemanticCache] = None
+_cache_unavailable = False
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[SemanticCache]:
+    """
+    Get the process-wide semantic cache
+
+    Enabled with LLM_SEMANTIC_CACHE=1. If LLM_SEMANTIC_CACHE_PATH is set the
+    cache is loaded from it on first use and saved back at exit.
+
+    Returns:
+        The shared SemanticCache, or None when disabled or unavailable
+    """
+    global _cache, _cache_unavailable
+    if os.getenv("LLM_SEMANTIC_CACHE") != "1":
+        return None
+
+    with _cache_lock:
+        if _cache_unavailable:
+            return None
+        if _cache is None:
+            try:
+                _cache = SemanticCache()
+            except ImportError as e:
+                # Remembered so the warning is logged once, not on every call
+                _cache_unavailable = True
+                logger.warning(f"Semantic cache disabled: {e}")
+                return None
+
+            path = os.getenv("LLM_SEMANTIC_CACHE_PATH")
+            if path:
+                # np.save appends .npy itself, so normalize before the exists check
+                path = Path(path).with_suffix(".npy")
+                if path.exists():
+                    _cache.load(path)
+                atexit.register(_cache.save, path)
+    return _cache
+
+
+def wrap_adapter(adapter: llm_adapter.LLMAdapter) -> llm_adapter.LLMAdapter:
+    """
+    Put a real LLM adapter behind the semantic cache when it is enabled
+
+    The mock adapter is returned unchanged since it is already instant.
+
+    Args:
+        adapter: Adapter returned by llm_adapter.create_llm_adapter
+
+    Returns:
+        SemanticCachingAdapter around ``adapter``, or ``adapter`` itself
+    """
+    if isinstance(adapter, llm_adapter.MockLLMAdapter):
+        return adapter
+    cache = get_cache()
+    if cache is None:
+        return adapter
+    return SemanticCachingAdapter(adapter, cache)
@@ -3,9 +3,9 @@
 Simple test for North region issue
 """
 import streamlit as st
-import pandas as pd
 import duckdb
 import llm_adapter
+import sales_data
 import sql_guard
 import os
 
@@ -15,18 +15,17 @@ os.environ.pop('ANTHROPIC_API_KEY', None)
 
 st.title("🔍 簡単テスト：北部地域")
 
-@st.cache_data
+@st.cache_resource
 def setup_data():
-    df = pd.read_csv('data/sample_sales.csv')
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
     con = duckdb.connect(':memory:')
-    con.register('sales', df)
+    sales_data.create_sales_table(con)
     schema_info = """CREATE TABLE sales (date TIMESTAMP, category TEXT, units INTEGER, unit_price INTEGER, region TEXT, sales_channel TEXT, customer_segment TEXT, revenue DOUBLE);"""
-    return df, con, schema_info
+    return con, schema_info
 
-df, con, schema_info = setup_data()
+con, schema_info = setup_data()
 
-st.write(f"データ行数: {len(df)}")
+n_rows = con.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+st.write(f"データ行数: {n_rows}")
 
 # Initialize session state
 if 'messages' not in st.session_state:
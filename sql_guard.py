@@ -1,6 +1,8 @@
 import re
 import logging
-from typing import List, Optional
+from textwrap import dedent
+from types import MappingProxyType
+from typing import List, Optional, Tuple
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,8 +24,69 @@ FORBIDDEN_TOKENS = [
     r'\bCREATE\s+TABLE\b'
 ]
 
+# Patterns compiled once at import; forbidden tokens are scanned in a single pass
+_FORBIDDEN_RE = re.compile("|".join(FORBIDDEN_TOKENS), re.IGNORECASE)
+_SELECT_RE = re.compile(r'^\s*select\b', re.IGNORECASE)
+_LIMIT_RE = re.compile(r'\bLIMIT\s+\d+\b', re.IGNORECASE)
+_GROUPBY_RE = re.compile(r'\bGROUP\s+BY\b', re.IGNORECASE)
+# String literals, quoted identifiers and comments, blanked out before keyword
+# scans so e.g. WHERE note = 'DROP' is not mistaken for a DROP statement
+_LITERALS_AND_COMMENTS_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.DOTALL)
+# Markdown code fence around LLM output (```sql, ```SQL or bare ```)
+_MD_FENCE_RE = re.compile(r'^```(?:sql)?\s*|\s*```$', re.IGNORECASE)
+
+# Question keywords mapped to intent tags; region keywords map to the region name
+_KEYWORD_TAGS = MappingProxyType({
+    '北部': 'North', 'north': 'North', '北': 'North',
+    '南部': 'South', 'south': 'South', '南': 'South',
+    '東部': 'East', 'east': 'East', '東': 'East',
+    '西部': 'West', 'west': 'West', '西': 'West',
+    '月': 'month', 'month': 'month', '月毎': 'month', '月別': 'month', 'monthly': 'month',
+    'カテゴリ': 'category', 'category': 'category', 'categories': 'category',
+    'electronics': 'category_name', 'clothing': 'category_name', 'beauty': 'category_name', 'groceries': 'category_name',
+    'チャネル': 'channel', 'channel': 'channel', 'channels': 'channel', 'sales_channel': 'channel',
+    'オンライン': 'channel', 'online': 'channel', '店舗': 'channel', 'store': 'channel',
+    '地域': 'region', 'region': 'region', 'regions': 'region', '地方': 'region',
+})
+
+# Regions in the order they take precedence when a question names several
+_REGION_NAMES = ('North', 'South', 'East', 'West')
+
+# Region fallback with the region as a bound parameter, so the SQL text is the
+# same for every region
+REGION_FALLBACK_QUERY = dedent("""
+    select region, sum(revenue) as total_revenue
+    from sales
+    where region = ?
+    group by 1
+    order by total_revenue desc;
+""").strip()
+
+# Per-region fallback queries with the region inlined, built once
+_REGION_QUERIES = MappingProxyType({
+    region_name: REGION_FALLBACK_QUERY.replace("?", f"'{region_name}'")
+    for region_name in _REGION_NAMES
+})
+
+# All keywords in one alternation so a question is scanned once; the lookahead
+# lets matches overlap (e.g. "regionsouth" yields both region and South)
+_KEYWORD_RE = re.compile(
+    "(?=(" + "|".join(sorted(map(re.escape, _KEYWORD_TAGS), key=len, reverse=True)) + "))"
+)
+
+
+def _question_tags(question: str) -> set:
+    """Collect the intent tags of every keyword found in the question"""
+    return {_KEYWORD_TAGS[m.group(1)] for m in _KEYWORD_RE.finditer(question.lower())}
+
+
+def _strip_literals(sql: str) -> str:
+    """Replace string literals, quoted identifiers and comments with a space"""
+    return _LITERALS_AND_COMMENTS_RE.sub(' ', sql)
+
+
 # Fallback queries for common scenarios
-FALLBACK_QUERIES = {
+FALLBACK_QUERIES = {name: dedent(sql).strip() for name, sql in {
     "monthly_category": """
         select month, category, sum(revenue) as total_revenue
         from sales_with_month
@@ -41,8 +104,14 @@ FALLBACK_QUERIES = {
         from sales
         group by 1
         order by total_revenue desc;
+    """,
+    "category_sales": """
+        select category, sum(revenue) as total_revenue
+        from sales
+        group by 1
+        order by total_revenue desc;
     """
-}
+}.items()}
 
 
 class SQLValidationError(Exception):
@@ -66,13 +135,13 @@ def validate_sql(sql: str) -> None:
     sql_clean = sql.strip()
     
     # Check if it's a SELECT statement
-    if not re.match(r'^\s*select\b', sql_clean, re.IGNORECASE):
+    if not _SELECT_RE.match(sql_clean):
         raise SQLValidationError("Only SELECT statements are allowed")
     
-    # Check for forbidden tokens
-    for token_pattern in FORBIDDEN_TOKENS:
-        if re.search(token_pattern, sql_clean, re.IGNORECASE):
-            raise SQLValidationError(f"Forbidden token detected: {token_pattern}")
+    # Check for forbidden tokens outside literals and comments
+    match = _FORBIDDEN_RE.search(_strip_literals(sql_clean))
+    if match:
+        raise SQLValidationError(f"Forbidden token detected: {match.group(0)}")
     
     logger.info("SQL validation passed")
 
@@ -88,13 +157,14 @@ def add_limit_if_needed(sql: str) -> str:
         SQL query with LIMIT added if needed
     """
     sql_clean = sql.strip()
+    sql_code = _strip_literals(sql_clean)
     
     # Check if query already has LIMIT
-    if re.search(r'\bLIMIT\s+\d+\b', sql_clean, re.IGNORECASE):
+    if _LIMIT_RE.search(sql_code):
         return sql_clean
     
     # Check if query has GROUP BY (aggregation queries don't need LIMIT)
-    if re.search(r'\bGROUP\s+BY\b', sql_clean, re.IGNORECASE):
+    if _GROUPBY_RE.search(sql_code):
         return sql_clean
     
     # Add LIMIT to the end of the query
@@ -120,12 +190,7 @@ def sanitize_sql(sql: str) -> str:
     """
     try:
         # Basic cleanup
-        sql_clean = sql.strip()
-        if sql_clean.startswith('```sql'):
-            sql_clean = sql_clean[6:]
-        if sql_clean.endswith('```'):
-            sql_clean = sql_clean[:-3]
-        sql_clean = sql_clean.strip()
+        sql_clean = _MD_FENCE_RE.sub('', sql.strip()).strip()
         
         # Validate the SQL
         validate_sql(sql_clean)
@@ -151,60 +216,55 @@ def get_fallback_query(question: str) -> str:
     Returns:
         Fallback SQL query
     """
-    question_lower = question.lower()
+    hits = _question_tags(question)
     
     # Check for specific region queries
-    region_keywords = {
-        '北部': 'North',
-        'north': 'North', 
-        '北': 'North',
-        '南部': 'South',
-        'south': 'South',
-        '南': 'South', 
-        '東部': 'East',
-        'east': 'East',
-        '東': 'East',
-        '西部': 'West', 
-        'west': 'West',
-        '西': 'West'
-    }
-    
-    for keyword, region_name in region_keywords.items():
-        if keyword in question_lower:
-            return f"""
-                select region, sum(revenue) as total_revenue
-                from sales
-                where region = '{region_name}'
-                group by 1
-                order by total_revenue desc;
-            """
+    for region_name in _REGION_NAMES:
+        if region_name in hits:
+            return _REGION_QUERIES[region_name]
     
     # Check for monthly/time-based questions
-    if any(keyword in question_lower for keyword in ['月', 'month', '月毎', '月別', 'monthly']):
-        if any(keyword in question_lower for keyword in ['カテゴリ', 'category', 'categories']):
-            return FALLBACK_QUERIES["monthly_category"]
+    if 'month' in hits and 'category' in hits:
+        return FALLBACK_QUERIES["monthly_category"]
     
     # Check for channel-related questions
-    if any(keyword in question_lower for keyword in ['チャネル', 'channel', 'channels', 'sales_channel', 'オンライン', 'online', '店舗', 'store']):
+    if 'channel' in hits:
         return FALLBACK_QUERIES["channel_sales"]
     
     # Check for general region-related questions
-    if any(keyword in question_lower for keyword in ['地域', 'region', 'regions', '地方']):
+    if 'region' in hits:
         return FALLBACK_QUERIES["region_sales"]
     
     # Check for category-related questions
-    if any(keyword in question_lower for keyword in ['カテゴリ', 'category', 'categories', 'electronics', 'clothing', 'beauty', 'groceries']):
-        return """
-            select category, sum(revenue) as total_revenue
-            from sales
-            group by 1
-            order by total_revenue desc;
-        """
+    if 'category' in hits or 'category_name' in hits:
+        return FALLBACK_QUERIES["category_sales"]
     
     # Default fallback - general summary
     return FALLBACK_QUERIES["region_sales"]
 
 
+def get_fallback_query_params(question: str) -> Tuple[str, list]:
+    """
+    Get a fallback query with its parameters for ``con.execute(sql, params)``
+    
+    Region questions share REGION_FALLBACK_QUERY with the region bound as a
+    parameter; other questions get the same SQL as get_fallback_query.
+    
+    Args:
+        question: User's natural language question
+        
+    Returns:
+        Tuple of (SQL query, parameter list)
+    """
+    hits = _question_tags(question)
+    
+    for region_name in _REGION_NAMES:
+        if region_name in hits:
+            return REGION_FALLBACK_QUERY, [region_name]
+    
+    return get_fallback_query(question), []
+
+
 def process_sql_safely(sql: str, question: str = "") -> str:
     """
     Process SQL query safely with fallback handling
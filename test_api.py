@@ -1,12 +1,31 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Shared session so repeated calls reuse pooled keep-alive connections
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                                       max_retries=Retry(total=3, backoff_factor=0.3)))
+
+def parse_json(response):
+    # Parse with orjson when available (stdlib json otherwise)
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
 
 def get_weather_data(city_name="Tokyo"):
     # 1) Geocoding API
-    geo_response = requests.get(
+    geo_response = _SESSION.get(
         "https://geocoding-api.open-meteo.com/v1/search",
-        params={"name": city_name, "count": 1, "language": "ja", "format": "json"}
+        params={"name": city_name, "count": 1, "language": "ja", "format": "json"},
+        timeout=5
     )
-    geo_data = geo_response.json()
+    geo_data = parse_json(geo_response)
     lat = geo_data["results"][0]["latitude"]
     lon = geo_data["results"][0]["longitude"]
     
@@ -14,11 +33,12 @@ def get_weather_data(city_name="Tokyo"):
     print(f"Latitude: {lat}, Longitude: {lon}")
     
     # 2) Weather forecast API
-    forecast_response = requests.get(
+    forecast_response = _SESSION.get(
         "https://api.open-meteo.com/v1/forecast",
-        params={"latitude": lat, "longitude": lon, "hourly": "temperature_2m", "timezone": "Asia/Tokyo"}
+        params={"latitude": lat, "longitude": lon, "hourly": "temperature_2m", "timezone": "Asia/Tokyo"},
+        timeout=5
     )
-    forecast_data = forecast_response.json()
+    forecast_data = parse_json(forecast_response)
     
     times = forecast_data["hourly"]["time"]
     temps = forecast_data["hourly"]["temperature_2m"]
@@ -1,61 +1,95 @@
+import asyncio
+
+import numpy as np
 import requests
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+@st.cache_resource
+def get_session():
+    """HTTP session shared across reruns so connections stay alive"""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                                          max_retries=Retry(total=3, backoff_factor=0.3)))
+    return session
 
-def get_weather_data(city_name="Tokyo"):
+def parse_json(response):
+    # orjson がある場合は高速にパース（なければ標準の json）
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+def get_weather_data(session, city_name="Tokyo"):
     # 1) ジオコーディング
-    geo = requests.get(
+    geo = parse_json(session.get(
         "https://geocoding-api.open-meteo.com/v1/search",
-        params={"name": city_name, "count": 1, "language": "ja", "format": "json"}
-    ).json()
+        params={"name": city_name, "count": 1, "language": "ja", "format": "json"},
+        timeout=5
+    ))
     lat = geo["results"][0]["latitude"]
     lon = geo["results"][0]["longitude"]
 
     # 2) 予報取得
-    forecast = requests.get(
+    forecast = parse_json(session.get(
         "https://api.open-meteo.com/v1/forecast",
-        params={"latitude": lat, "longitude": lon, "hourly": "temperature_2m", "timezone": "Asia/Tokyo"}
-    ).json()
+        params={"latitude": lat, "longitude": lon, "hourly": "temperature_2m", "timezone": "Asia/Tokyo"},
+        timeout=5
+    ))
 
     times = forecast["hourly"]["time"]
     temps = forecast["hourly"]["temperature_2m"]
     
     return times, temps
 
+async def get_weather_data_many(session, cities):
+    # 都市ごとの取得を並列に実行（セッションの接続プールを共有）
+    return await asyncio.gather(*(asyncio.to_thread(get_weather_data, session, c) for c in cities))
+
 def main():
     st.title("天気予報ダッシュボード")
 
-    city = st.selectbox("都市を選択", ["Tokyo", "Osaka", "Kyoto", "Yokohama"])
+    cities = st.multiselect("都市を選択", ["Tokyo", "Osaka", "Kyoto", "Yokohama"], default=["Tokyo"])
 
-    if st.button("天気データを取得"):
+    if st.button("天気データを取得", disabled=not cities):
         with st.spinner("データを取得中..."):
             try:
-                times, temps = get_weather_data(city)
+                results = asyncio.run(get_weather_data_many(get_session(), cities))
                 
-                df = pd.DataFrame({
-                    'time': pd.to_datetime(times),
-                    'temperature': temps
-                })
+                df = pd.concat(
+                    [pd.DataFrame({'city': city, 'time': pd.to_datetime(times, format='%Y-%m-%dT%H:%M', cache=True), 'temperature': temps})
+                     for city, (times, temps) in zip(cities, results)],
+                    ignore_index=True
+                )
                 
-                st.success(f"{city}の天気データを取得しました！")
+                st.success(f"{'、'.join(cities)}の天気データを取得しました！")
                 
                 st.subheader("温度の時系列グラフ")
-                fig = px.line(df, x='time', y='temperature', 
-                             title=f'{city}の時間別気温予報',
-                             labels={'time': '時間', 'temperature': '気温 (°C)'})
+                fig = px.line(df, x='time', y='temperature', color='city',
+                             title='時間別気温予報',
+                             labels={'time': '時間', 'temperature': '気温 (°C)', 'city': '都市'})
                 st.plotly_chart(fig, use_container_width=True)
                 
                 st.subheader("統計情報")
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    st.metric("最高気温", f"{max(temps):.1f}°C")
-                with col2:
-                    st.metric("最低気温", f"{min(temps):.1f}°C")
-                with col3:
-                    st.metric("平均気温", f"{sum(temps)/len(temps):.1f}°C")
-                with col4:
-                    st.metric("データ数", len(temps))
+                for city, (times, temps) in zip(cities, results):
+                    arr = np.asarray(temps, dtype=np.float32)
+                    st.caption(city)
+                    col1, col2, col3, col4 = st.columns(4)
+                    with col1:
+                        st.metric("最高気温", f"{arr.max():.1f}°C")
+                    with col2:
+                        st.metric("最低気温", f"{arr.min():.1f}°C")
+                    with col3:
+                        st.metric("平均気温", f"{arr.mean():.1f}°C")
+                    with col4:
+                        st.metric("データ数", arr.size)
                 
                 st.subheader("詳細データ")
                 st.dataframe(df)
@@ -1,75 +1,183 @@
 # viz.py
+from typing import Tuple
+
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import streamlit as st
 
 
+def _narrow_numeric(s):
+    # 値が変わらない範囲で最小の型に（Plotly は数値配列を型付きのまま送るので転送量が減る）
+    if s.dtype == np.float64:
+        s32 = s.astype(np.float32)
+        return s32 if np.array_equal(s32.to_numpy(np.float64), s.to_numpy(), equal_nan=True) else s
+    if pd.api.types.is_integer_dtype(s):
+        return pd.to_numeric(s, downcast="integer")
+    return s
+
+
 def _coerce_numeric(s):
     if pd.api.types.is_numeric_dtype(s):
         return s
-    try:
-        return pd.to_numeric(s, errors="coerce").fillna(0)
-    except Exception:
-        return s
+    # 変換できない値は NaN のまま残す（Plotly では欠損として描画されない）
+    return _narrow_numeric(pd.to_numeric(s, errors="coerce"))
 
 
-def auto_visualize(df):
-    if df is None or len(df) == 0:
-        st.info("該当データがありません。")
-        return
+def lttb_downsample(x, y, n_out: int) -> np.ndarray:
+    """
+    Pick the points to keep with Largest-Triangle-Three-Buckets downsampling
+
+    Args:
+        x: Monotonic x values (datetimes should be passed as int64)
+        y: y values, same length as x
+        n_out: Maximum number of points to keep
+
+    Returns:
+        Sorted integer positions of the points to keep
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # 先頭・末尾は固定し、間の n - 2 点を n_out - 2 個のバケットに分ける
+    edges = (np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def table_preview(df: pd.DataFrame, max_rows: int = 5000) -> Tuple[pd.DataFrame, bool]:
+    """
+    Cap a DataFrame for st.dataframe and make its strings Arrow-native
+
+    Args:
+        df: DataFrame to display
+        max_rows: Maximum number of rows sent to the browser
+
+    Returns:
+        Tuple of (at most ``max_rows`` rows with object columns as
+        ``string[pyarrow]``, whether rows were cut off)
+    """
+    view = df.head(max_rows)
+    obj_cols = view.select_dtypes("object").columns
+    if len(obj_cols):
+        view = view.astype({c: "string[pyarrow]" for c in obj_cols})
+    return view, len(df) > max_rows
+
+
+# グラフの次元・値として優先する列（先頭ほど優先）
+_DIM_CANDIDATES = ("category", "region", "sales_channel", "customer_segment")
+_VAL_CANDIDATES = ("total_revenue", "revenue", "units", "unit_price")
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _build_figure(df):
+    """
+    Build the chart for a query result; cached so reruns with the same
+    result reuse the figure instead of rebuilding it
+
+    Returns:
+        Plotly figure, or None when no numeric column can be plotted
+    """
+    # 列名の集合は一度だけ作り、以降の有無判定はすべてこれで行う
+    cols = set(df.columns)
+    has_month = "month" in cols
+
+    # 変換した列はここに集め、最後に一度だけ assign する（df.copy() を繰り返さない）
+    overrides = {}
 
     # month を datetime に（あれば）
-    if "month" in df.columns:
-        try:
-            df = df.copy()
-            df["month"] = pd.to_datetime(df["month"], errors="coerce")
-            df = df.sort_values("month")
-        except Exception:
-            pass
+    # DuckDB の TIMESTAMP は既に datetime64 なので変換不要
+    if has_month and not pd.api.types.is_datetime64_any_dtype(df["month"]):
+        overrides["month"] = pd.to_datetime(df["month"], errors="coerce")
 
     # 次元候補
-    dims = [c for c in ["category", "region", "sales_channel", "customer_segment"] if c in df.columns]
-    dim = dims[0] if dims else None
+    dim = next((c for c in _DIM_CANDIDATES if c in cols), None)
 
     # 値候補
-    preferred = ["total_revenue", "revenue", "units", "unit_price"]
-    val = next((c for c in preferred if c in df.columns), None)
+    val = next((c for c in _VAL_CANDIDATES if c in cols), None)
     if val is None:
-        # 任意の数値列
-        for c in df.columns:
-            if pd.api.types.is_numeric_dtype(df[c]):
-                val = c; break
+        # 任意の数値列（dtypes を一度だけ走査）
+        numeric_cols = df.select_dtypes(include="number").columns
+        val = numeric_cols[0] if len(numeric_cols) else None
     if val is None:
         # 数値に変換できる文字列列を探す
         for c in df.columns:
             coerced = _coerce_numeric(df[c])
-            if pd.api.types.is_numeric_dtype(coerced):
-                df = df.copy(); df[c] = coerced; val = c; break
+            if pd.api.types.is_numeric_dtype(coerced) and coerced.notna().any():
+                overrides[c] = coerced; val = c; break
 
     if val is None:
-        st.warning("数値列が見つからず、グラフを描画できませんでした。")
+        return None
+
+    if overrides:
+        df = df.assign(**overrides)
+    if has_month and not df["month"].is_monotonic_increasing:
+        df = df.sort_values("month", kind="stable")
+
+    if has_month:
+        # 同じ month × 次元の行が複数あれば先に合計し、1 系列 1 点/月にする
+        if dim and df.duplicated(["month", dim]).any():
+            df = df.groupby(["month", dim], as_index=False, sort=False, observed=True, dropna=False)[val].sum()
+        # WebGL (Scattergl) で描画し、系列が増えても SVG の DOM を膨らませない
+        groups = df.groupby(dim, sort=False, observed=True, dropna=False) if dim else [(val, df)]
+        fig = go.Figure([
+            go.Scattergl(x=g["month"], y=_narrow_numeric(g[val]), mode="lines+markers", name=str(k))
+            for k, g in groups
+        ])
+        fig.update_layout(
+            margin=dict(l=0, r=0, t=30, b=0), title=f"{(dim or 'all')} × {val}",
+            xaxis_title="month", yaxis_title=val, legend_title=dim,
+            showlegend=dim is not None, uirevision=f"line:{dim}:{val}",
+        )
+        return fig
+
+    # 次元の値ごとに行が多い結果は、Plotly に積み上げさせず先に合計しておく
+    if dim and len(df) > df[dim].nunique() * 2:
+        df = df.groupby(dim, as_index=False, sort=False, observed=True, dropna=False)[val].sum()
+
+    # 棒グラフ（次元がなければ index を x に）。DataFrame はコピーせず列だけ渡す
+    xcol = dim if dim else (df.index.name or "index")
+    x = (df[dim] if dim else df.index.to_series()).astype(str)  # x が非文字列ならキャスト
+    y = _narrow_numeric(_coerce_numeric(df[val]))
+    fig = px.bar(x=x.to_numpy(), y=y.to_numpy(), labels={"x": xcol, "y": val})
+    fig.update_layout(margin=dict(l=0, r=0, t=30, b=0), title=f"{xcol} × {val}", uirevision=f"bar:{xcol}:{val}")
+    return fig
+
+
+def auto_visualize(df):
+    if df is None or len(df) == 0:
+        st.info("該当データがありません。")
         return
 
     try:
-        if "month" in df.columns:
-            fig = px.line(df, x="month", y=val, color=dim, markers=True)
-            fig.update_layout(margin=dict(l=0, r=0, t=30, b=0), title=f"{(dim or 'all')} × {val}")
-            st.plotly_chart(fig, use_container_width=True)
-            return
-
-        # 棒グラフ
-        xcol = dim if dim else df.reset_index().columns[0]
-        plot_df = df.copy()
-        if dim is None:
-            plot_df = plot_df.reset_index()
-        # x が非文字列ならキャスト
-        plot_df[xcol] = plot_df[xcol].astype(str)
-        plot_df[val] = _coerce_numeric(plot_df[val])
-        fig = px.bar(plot_df, x=xcol, y=val)
-        fig.update_layout(margin=dict(l=0, r=0, t=30, b=0), title=f"{xcol} × {val}")
-        st.plotly_chart(fig, use_container_width=True)
+        fig = _build_figure(df)
     except Exception as e:
         st.warning(f"グラフ描画に失敗しました: {e}")
+        return
+
+    if fig is None:
+        st.warning("数値列が見つからず、グラフを描画できませんでした。")
+        return
+    st.plotly_chart(fig, use_container_width=True)
 
 
 # Legacy functions for backward compatibility (if needed elsewhere)
@@ -82,6 +190,30 @@ def format_number(num) -> str:
     return str(num)
 
 
+def _format_number_column(s: pd.Series) -> list:
+    """format_number over a whole numeric column in one pass over plain Python values"""
+    missing = s.isna().to_numpy()
+    return ['N/A' if na else f"{v:,}" for v, na in zip(s.tolist(), missing)]
+
+
+# Numeric dtypes formatted with thousands separators by display_data_table
+_DISPLAY_NUMBER_DTYPES = ["int64", "float64", "Int64", "Float64"]
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _format_for_display(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of ``df`` with numeric columns formatted as strings (cached across reruns)"""
+    df_display = df.copy()
+    
+    # 64-bit numeric columns found in one dtype scan; float32 and other
+    # narrowed dtypes are left as-is since tolist() would expose their
+    # binary rounding (e.g. 0.1 -> 0.10000000149011612)
+    for col in df_display.select_dtypes(include=_DISPLAY_NUMBER_DTYPES).columns:
+        df_display[col] = _format_number_column(df_display[col])
+    
+    return df_display
+
+
 def display_data_table(df: pd.DataFrame) -> None:
     """
     Display DataFrame as a formatted table in Streamlit
@@ -93,16 +225,9 @@ def display_data_table(df: pd.DataFrame) -> None:
         st.warning("クエリの結果が空です。")
         return
     
-    # Format numeric columns
-    df_display = df.copy()
-    
-    for col in df_display.columns:
-        if df_display[col].dtype in ['int64', 'float64']:
-            df_display[col] = df_display[col].apply(format_number)
-    
     # Display with custom styling
     st.dataframe(
-        df_display,
+        _format_for_display(df),
         use_container_width=True,
         hide_index=True
     )